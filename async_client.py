@@ -0,0 +1,245 @@
+import asyncio
+import itertools
+import logging
+
+import mbap
+from modbus_helpers import float32_to_registers
+from register_image import store_block, decode_block
+from coil_bank import coils_to_mask
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncModbusClient:
+    """Асинхронный Modbus TCP клиент с конвейерной передачей запросов.
+
+    Несколько запросов могут одновременно ожидать ответа на одном сокете;
+    ответы сопоставляются с запросами по идентификатору транзакции MBAP.
+    Как и в pyModbusTCP, ответ с чужим идентификатором устройства, кодом
+    функции или длиной данных отбрасывается как ошибка.
+    Методы повторяют интерфейс pyModbusTCP.ModbusClient: при ошибке
+    чтения возвращается None, при ошибке записи False.
+    """
+
+    def __init__(self, host, port=502, unit_id=1, timeout=10, max_pending=16):
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self._transaction_ids = itertools.count(1)
+        self._pending = {}
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def open(self):
+        """Установка соединения с устройством."""
+        async with self._open_lock:
+            if self.is_open:
+                return True
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.error(f"Не удалось подключиться к {self.host}:{self.port}: {e}")
+                return False
+            self._receiver = asyncio.create_task(self._receive())
+            return True
+
+    async def close(self):
+        """Закрытие соединения и отмена ожидающих запросов."""
+        if self._receiver is not None:
+            self._receiver.cancel()
+            self._receiver = None
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+        self._fail_pending()
+
+    def _fail_pending(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_result(None)
+        self._pending.clear()
+
+    async def _receive(self):
+        """Приём ответов и передача их ожидающим запросам."""
+        try:
+            while True:
+                transaction_id, unit_id, pdu = await mbap.read_adu(self._reader)
+                future = self._pending.pop(transaction_id, None)
+                if future is not None and not future.done():
+                    future.set_result((unit_id, pdu))
+        except (asyncio.IncompleteReadError, OSError) as e:
+            logger.error(f"Соединение с {self.host}:{self.port} разорвано: {e}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._fail_pending()
+
+    async def request(self, pdu):
+        """Отправка PDU и ожидание ответа; None при ошибке или исключении Modbus."""
+        if not self.is_open and not await self.open():
+            return None
+        async with self._slots:
+            transaction_id = next(self._transaction_ids) & 0xFFFF
+            future = asyncio.get_running_loop().create_future()
+            self._pending[transaction_id] = future
+            try:
+                async with self._write_lock:
+                    self._writer.write(mbap.build_adu(transaction_id, self.unit_id, pdu))
+                    await self._writer.drain()
+                response = await asyncio.wait_for(future, self.timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                logger.error(f"Нет ответа на запрос FC{pdu[0]:02d} (транзакция {transaction_id}): {e!r}")
+                return None
+            finally:
+                self._pending.pop(transaction_id, None)
+        if response is None:
+            return None
+        unit_id, response = response
+        if unit_id != self.unit_id or not response or response[0] & 0x7F != pdu[0]:
+            logger.error(f"Чужой ответ на запрос FC{pdu[0]:02d} (транзакция {transaction_id}): "
+                         f"устройство {unit_id}, PDU {response.hex()}")
+            return None
+        if response[0] & 0x80:
+            if len(response) != 2:
+                logger.error(f"Некорректный ответ с исключением на запрос FC{pdu[0]:02d}: {response.hex()}")
+                return None
+            logger.error(f"Исключение Modbus {response[1]} на запрос FC{pdu[0]:02d}")
+            return None
+        return response
+
+    @staticmethod
+    def _check_length(pdu, response, byte_count):
+        """Проверка счётчика байт и длины ответа на чтение."""
+        if response is None:
+            return False
+        if len(response) < 2 or response[1] != byte_count or len(response) != 2 + byte_count:
+            logger.error(f"Некорректная длина ответа на запрос FC{pdu[0]:02d}: "
+                         f"ожидалось {byte_count} байт, получено {response.hex()}")
+            return False
+        return True
+
+    @staticmethod
+    def _check_echo(pdu, response):
+        """Проверка ответа на запись: адрес и значение (количество) повторяют запрос."""
+        if response is None:
+            return False
+        if response != pdu[:5]:
+            logger.error(f"Ответ на запрос FC{pdu[0]:02d} не повторяет запрос: {response.hex()}")
+            return False
+        return True
+
+    async def read_holding_registers(self, address, count):
+        pdu = mbap.read_registers_request(address, count)
+        response = await self.request(pdu)
+        return mbap.decode_registers(response) if self._check_length(pdu, response, count * 2) else None
+
+    async def read_coils(self, address, count):
+        pdu = mbap.read_coils_request(address, count)
+        response = await self.request(pdu)
+        return mbap.decode_bits(response, count) if self._check_length(pdu, response, (count + 7) // 8) else None
+
+    async def write_multiple_registers(self, address, registers):
+        pdu = mbap.write_registers_request(address, registers)
+        return self._check_echo(pdu, await self.request(pdu))
+
+    async def write_single_coil(self, address, value):
+        pdu = mbap.write_coil_request(address, value)
+        return self._check_echo(pdu, await self.request(pdu))
+
+
+async def ensure_connection(client):
+    """Проверка и восстановление подключения к Modbus устройству."""
+    if not client.is_open:
+        if not await client.open():
+            logger.error("Не удалось установить соединение с устройством Modbus.")
+            return False
+        else:
+            logger.info("Соединение с устройством Modbus установлено.")
+    return True
+
+
+async def read_registers(client, address, count):
+    """Чтение значения регистров по указанному адресу."""
+    if await ensure_connection(client):
+        response = await client.read_holding_registers(address, count)
+        if response:
+            return response
+        else:
+            logger.error(f"Ошибка чтения регистров по адресу {address}")
+    return None
+
+
+async def write_registers(client, address, value):
+    """Запись значения в регистры по указанному адресу."""
+    if await ensure_connection(client):
+        registers = float32_to_registers(value)
+        success = await client.write_multiple_registers(address, registers)
+        if not success:
+            logger.error(f"Ошибка записи в регистры по адресу {address}")
+        else:
+            logger.debug(f"Успешная запись в регистры по адресу {address} со значением {value}")
+        return success
+    return False
+
+
+async def read_flag(client, address):
+    """Чтение значения флага (катушки) по указанному адресу."""
+    if await ensure_connection(client):
+        response = await client.read_coils(address, 1)
+        if response:
+            return response[0]
+        else:
+            logger.error(f"Ошибка чтения флага по адресу {address}")
+    return None
+
+
+async def write_flag(client, address, value):
+    """Запись значения флага (катушки) по указанному адресу."""
+    if await ensure_connection(client):
+        logger.debug(f"Попытка записи флага по адресу {address} со значением {value}")
+        success = await client.write_single_coil(address, value)
+        if not success:
+            logger.error(f"Ошибка записи флага по адресу {address}")
+        else:
+            logger.debug(f"Успешная запись флага по адресу {address}")
+        return success
+    return False
+
+
+async def read_image(client, plan):
+    """Чтение образа регистров: все блоки плана отправляются одновременно."""
+    responses = await asyncio.gather(*(client.read_holding_registers(start, count) for start, count in plan))
+    image = {}
+    for (start, count), response in zip(plan, responses):
+        store_block(image, start, count, response)
+    return image
+
+
+async def read_tags(client, decoders):
+    """Чтение тегов по скомпилированному плану: блоки отправляются одновременно."""
+    responses = await asyncio.gather(*(client.read_holding_registers(decoder.start, decoder.count)
+                                       for decoder in decoders))
+    values = {}
+    for decoder, response in zip(decoders, responses):
+        values.update(decode_block(decoder, response))
+    return values
+
+
+async def read_snapshot(client, plan, coil_count):
+    """Одновременное чтение образа регистров и банка катушек: (образ, маска)."""
+    image, coils = await asyncio.gather(read_image(client, plan), client.read_coils(0, coil_count))
+    return image, coils_to_mask(0, coil_count, coils)
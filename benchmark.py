@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+from pyModbusTCP.client import ModbusClient
+
+import async_client
+from async_client import AsyncModbusClient
+from coil_bank import read_coil_bank
+from plc_simulator import PlcSimulator
+from register_image import read_image
+from register_map import load_register_map
+
+logger = logging.getLogger(__name__)
+
+# Условия канала: задержка ответа (RTT), разброс и доля потерянных запросов
+LINK_PROFILES = {
+    "lan": dict(latency=0.001, jitter=0.0002, drop_rate=0.0),
+    "vpn": dict(latency=0.050, jitter=0.010, drop_rate=0.0),
+    "gsm": dict(latency=0.300, jitter=0.080, drop_rate=0.0),
+    "lossy": dict(latency=0.050, jitter=0.010, drop_rate=0.02),
+}
+
+# Стратегии опроса полного образа панели (все регистры и катушки карты)
+STRATEGIES = ("per_tag", "block", "pipelined", "pipelined_block")
+
+
+class TimedClient:
+    """Обёртка синхронного клиента, измеряющая время каждого запроса."""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = []
+        self.failures = 0
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        response = method(*args)
+        self.latencies.append(time.perf_counter() - start)
+        if response is None:
+            self.failures += 1
+        return response
+
+    def read_holding_registers(self, address, count):
+        return self._timed(self.client.read_holding_registers, address, count)
+
+    def read_coils(self, address, count):
+        return self._timed(self.client.read_coils, address, count)
+
+
+class TimedAsyncClient(AsyncModbusClient):
+    """Асинхронный клиент, измеряющий время каждого запроса."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self.failures = 0
+
+    async def request(self, pdu):
+        start = time.perf_counter()
+        response = await super().request(pdu)
+        self.latencies.append(time.perf_counter() - start)
+        if response is None:
+            self.failures += 1
+        return response
+
+
+def cycle_per_tag(client, register_map):
+    """Текущая схема панели: отдельный запрос на каждый тег."""
+    for tag in register_map.register_tags:
+        client.read_holding_registers(tag.address, tag.width)
+    for tag in register_map.coil_tags:
+        client.read_coils(tag.address, 1)
+
+
+def cycle_block(client, register_map):
+    """Блочное чтение образа регистров и банка катушек."""
+    read_image(client, register_map.register_plan)
+    read_coil_bank(client, 0, register_map.coil_count)
+
+
+async def cycle_pipelined(client, register_map):
+    """Запросы на каждый тег, отправленные одновременно по одному сокету."""
+    await asyncio.gather(
+        *(client.read_holding_registers(tag.address, tag.width) for tag in register_map.register_tags),
+        *(client.read_coils(tag.address, 1) for tag in register_map.coil_tags),
+    )
+
+
+async def cycle_pipelined_block(client, register_map):
+    """Блочное чтение образа и катушек одновременно."""
+    await async_client.read_snapshot(client, register_map.register_plan, register_map.coil_count)
+
+
+def run_strategy(strategy, register_map, port, cycles, timeout):
+    """Выполнение циклов опроса стратегией; возвращает (время циклов, клиент)."""
+    durations = []
+    if strategy in ("per_tag", "block"):
+        cycle = cycle_per_tag if strategy == "per_tag" else cycle_block
+        client = TimedClient(ModbusClient(host="127.0.0.1", port=port, auto_open=True, timeout=timeout))
+        client.client.open()
+        for _ in range(cycles):
+            start = time.perf_counter()
+            cycle(client, register_map)
+            durations.append(time.perf_counter() - start)
+        client.client.close()
+        return durations, client
+
+    cycle = cycle_pipelined if strategy == "pipelined" else cycle_pipelined_block
+
+    async def run():
+        client = TimedAsyncClient("127.0.0.1", port, timeout=timeout, max_pending=64)
+        await client.open()
+        for _ in range(cycles):
+            start = time.perf_counter()
+            await cycle(client, register_map)
+            durations.append(time.perf_counter() - start)
+        await client.close()
+        return client
+
+    return durations, asyncio.run(run())
+
+
+def benchmark(profile, strategy, register_map, cycles=5, timeout=None):
+    """Замер одной стратегии в одном профиле канала."""
+    link = LINK_PROFILES[profile]
+    if timeout is None:
+        timeout = 1.0 + 3 * link["latency"]
+    simulator = PlcSimulator.from_register_map(register_map, seed=0, **link)
+    simulator.start(port=0)
+    try:
+        durations, client = run_strategy(strategy, register_map, simulator.port, cycles, timeout)
+    finally:
+        simulator.stop()
+    latencies = np.array(client.latencies)
+    return {
+        "profile": profile,
+        "strategy": strategy,
+        "cycles": cycles,
+        "cycle_time": float(np.mean(durations)),
+        "cycle_time_p50": float(np.percentile(durations, 50)),
+        "round_trips": simulator.requests / cycles,
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p99": float(np.percentile(latencies, 99)),
+        "failures": client.failures,
+        "bytes_per_cycle": (simulator.bytes_received + simulator.bytes_sent) / cycles,
+    }
+
+
+def print_results(results):
+    """Вывод результатов таблицей."""
+    header = (f"{'канал':<7}{'стратегия':<17}{'цикл, мс':>10}{'запросов':>10}"
+              f"{'p50, мс':>10}{'p99, мс':>10}{'ошибок':>8}{'байт/цикл':>11}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['profile']:<7}{r['strategy']:<17}{r['cycle_time'] * 1000:>10.1f}{r['round_trips']:>10.1f}"
+              f"{r['latency_p50'] * 1000:>10.1f}{r['latency_p99'] * 1000:>10.1f}{r['failures']:>8}"
+              f"{r['bytes_per_cycle']:>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк стратегий опроса панели на имитаторе контроллера")
+    parser.add_argument("--profiles", nargs="+", choices=LINK_PROFILES, default=list(LINK_PROFILES))
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument("--cycles", type=int, default=5, help="циклов опроса на замер")
+    parser.add_argument("--timeout", type=float, default=None, help="тайм-аут запроса, с")
+    parser.add_argument("--json", help="файл для сохранения результатов в JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    register_map = load_register_map()
+    results = []
+    for profile in args.profiles:
+        for strategy in args.strategies:
+            results.append(benchmark(profile, strategy, register_map, args.cycles, args.timeout))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def read_coil_bank(client, start, count):
+    """Чтение банка катушек одним запросом FC01.
+
+    Возвращает битовую маску, в которой бит N соответствует катушке N,
+    или None при ошибке чтения.
+    """
+    return coils_to_mask(start, count, client.read_coils(start, count))
+
+
+def coils_to_mask(start, count, response):
+    """Упаковка ответа на чтение катушек в битовую маску."""
+    if not response or len(response) != count:
+        logger.error(f"Ошибка чтения катушек {start}-{start + count - 1}")
+        return None
+    mask = 0
+    for offset, bit in enumerate(response):
+        if bit:
+            mask |= 1 << (start + offset)
+    return mask
+
+
+def coil_bit(mask, address):
+    """Состояние катушки по указанному адресу из битовой маски."""
+    return bool(mask >> address & 1)
@@ -0,0 +1,86 @@
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Состояния соединения с устройством
+CONNECTED = "connected"
+CONNECTING = "connecting"
+BACKOFF = "backoff"
+
+
+class ConnectionManager:
+    """Управление соединением с устройством Modbus.
+
+    Подключение выполняется в отдельном потоке с экспоненциальной задержкой
+    между попытками и случайным разбросом. Пока соединения нет, available()
+    сразу возвращает False, и опрос не блокируется на client.open().
+    Клиент должен быть создан с auto_open=False.
+    """
+
+    def __init__(self, client, initial_delay=1.0, max_delay=60.0, jitter=0.2, on_connect=None):
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.on_connect = on_connect
+        self.state = CONNECTING
+        self.delay = initial_delay
+        self.reconnects = 0
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="modbus-connection", daemon=True)
+
+    def start(self):
+        """Запуск фонового подключения."""
+        self._thread.start()
+
+    def stop(self):
+        """Остановка фонового подключения и закрытие соединения."""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.client.close()
+
+    def available(self):
+        """Проверка наличия соединения без блокировки."""
+        if self.state == CONNECTED and not self.client.is_open:
+            self.lost()
+        return self.state == CONNECTED
+
+    def lost(self):
+        """Отметка о потере соединения: переподключение в фоне."""
+        if self.state == CONNECTED:
+            logger.error("Соединение с устройством Modbus потеряно.")
+            self.client.close()
+            self.state = BACKOFF
+            self.delay = self.initial_delay
+            self._wakeup.set()
+
+    def next_delay(self):
+        """Следующая задержка перед попыткой подключения (с разбросом)."""
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.delay = min(self.delay * 2, self.max_delay)
+        return delay
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self.state == CONNECTED:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            self.state = CONNECTING
+            if self.client.open():
+                logger.info("Соединение с устройством Modbus установлено.")
+                self.state = CONNECTED
+                self.delay = self.initial_delay
+                self.reconnects += 1
+                if self.on_connect is not None:
+                    self.on_connect()
+                continue
+            self.state = BACKOFF
+            delay = self.next_delay()
+            logger.error(f"Не удалось установить соединение с устройством Modbus, повтор через {delay:.1f} с.")
+            self._stop_event.wait(delay)
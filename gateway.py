@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import logging
+import signal
+import struct
+import threading
+import time
+
+import numpy as np
+from pyModbusTCP.client import ModbusClient
+
+import mbap
+from metrics_server import MetricsServer
+from poller import Poller
+from register_map import DEFAULT_MAP_PATH, load_register_map
+
+logger = logging.getLogger(__name__)
+
+
+def tag_freshness(tags, size, freshness):
+    """Окно свежести образа по адресам, с: наименьшее из окон классов опроса тегов по адресу."""
+    windows = np.full(size, np.inf)
+    for tag in tags:
+        window = freshness.get(tag.poll)
+        if window is not None:
+            end = tag.address + tag.width
+            windows[tag.address:end] = np.minimum(windows[tag.address:end], window)
+    return windows
+
+
+class ImageClient:
+    """Обёртка pyModbusTCP клиента, сохраняющая ответы устройства в образ.
+
+    Каждый успешно прочитанный или записанный блок регистров и катушек
+    копируется в образ вместе со временем получения (time.monotonic()),
+    по которому шлюз отвечает на запросы без обращения к устройству.
+    Остальные атрибуты передаются исходному клиенту, как у InstrumentedClient.
+    """
+
+    def __init__(self, client, register_count, coil_count):
+        self.client = client
+        self.registers = np.zeros(register_count, dtype=np.uint16)
+        self.register_times = np.full(register_count, -np.inf)
+        self.coils = np.zeros(coil_count, dtype=bool)
+        self.coil_times = np.full(coil_count, -np.inf)
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _store(self, image, times, address, values):
+        with self.lock:
+            end = min(address + len(values), len(image))
+            if address < end:
+                image[address:end] = values[:end - address]
+                times[address:end] = time.monotonic()
+
+    def read_holding_registers(self, address, count=1):
+        response = self.client.read_holding_registers(address, count)
+        if response and len(response) == count:
+            self._store(self.registers, self.register_times, address, response)
+        return response
+
+    def read_coils(self, address, count=1):
+        response = self.client.read_coils(address, count)
+        if response and len(response) == count:
+            self._store(self.coils, self.coil_times, address, response)
+        return response
+
+    def write_multiple_registers(self, address, registers):
+        success = self.client.write_multiple_registers(address, registers)
+        if success:
+            self._store(self.registers, self.register_times, address, registers)
+        return success
+
+    def write_single_coil(self, address, value):
+        success = self.client.write_single_coil(address, value)
+        if success:
+            self._store(self.coils, self.coil_times, address, [value])
+        return success
+
+    def registers_at(self, address, count):
+        """Регистры образа и время их получения (-inf для ещё не прочитанных)."""
+        with self.lock:
+            return self.registers[address:address + count].tolist(), self.register_times[address:address + count].copy()
+
+    def coils_at(self, address, count):
+        """Катушки образа и время их получения (-inf для ещё не прочитанных)."""
+        with self.lock:
+            return self.coils[address:address + count].tolist(), self.coil_times[address:address + count].copy()
+
+
+class ModbusGateway:
+    """Шлюз Modbus TCP: одно соединение с контроллером на любое число панелей.
+
+    Поток опроса Poller читает карту регистров по своим классам опроса
+    через ImageClient, а шлюз отвечает на FC01/FC03 панелей из образа,
+    не обращаясь к контроллеру, так что нагрузка на контроллер не зависит
+    от числа подключённых панелей. Запись FC05/FC16 передаётся в контроллер
+    через поток опроса, ответ панели отправляется после ответа контроллера.
+
+    Если образ по запрошенным адресам ещё не прочитан или старше окна
+    свежести класса опроса их тегов (раздел "freshness" настроек шлюза,
+    без окна - образ не устаревает), блоки плана чтения, которые их
+    содержат, перечитываются. Одновременные запросы к тем же блокам
+    присоединяются к уже выполняемому чтению (single-flight) и получают
+    срез образа после его ответа. Без связи с контроллером или при ошибке
+    чтения панель получает исключение GATEWAY_TARGET_FAILED.
+    """
+
+    def __init__(self, client, register_map, publish=False):
+        register_count = max((tag.address + tag.width for tag in register_map.register_tags), default=0)
+        self.image = ImageClient(client, register_count, register_map.coil_count)
+        self.poller = Poller(self.image, register_map, publish=publish)
+        self.register_map = register_map
+        freshness = (register_map.gateway or {}).get("freshness", {})
+        self.register_freshness = tag_freshness(register_map.register_tags, register_count, freshness)
+        self.coil_freshness = tag_freshness(register_map.coil_tags, register_map.coil_count, freshness)
+        self.blocks = {
+            mbap.READ_HOLDING_REGISTERS: register_map.register_plan,
+            mbap.READ_COILS: [(0, register_map.coil_count)] if register_map.coil_count else [],
+        }
+        self.in_flight = {}
+        self.requests = 0
+        self._server = None
+        self._writers = set()
+        self._loop = None
+        self._thread = None
+        self.port = None
+
+    async def read_response(self, function_code, address, count):
+        """PDU ответа на чтение: из образа, при необходимости перечитанного."""
+        if function_code == mbap.READ_HOLDING_REGISTERS:
+            size, limit, cached, freshness, response = (len(self.image.registers), 125, self.image.registers_at,
+                                                        self.register_freshness, mbap.registers_response)
+        else:
+            size, limit, cached, freshness, response = (len(self.image.coils), 2000, self.image.coils_at,
+                                                        self.coil_freshness, mbap.coils_response)
+        if not 1 <= count <= limit:
+            return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+        if address + count > size:
+            return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+        if not self.poller.state()[2]:
+            return mbap.exception_pdu(function_code, mbap.GATEWAY_TARGET_FAILED)
+        values, times = cached(address, count)
+        if np.isinf(times).any() or (time.monotonic() - times > freshness[address:address + count]).any():
+            if not await self.refresh(function_code, address, count):
+                return mbap.exception_pdu(function_code, mbap.GATEWAY_TARGET_FAILED)
+            values, times = cached(address, count)
+            if np.isinf(times).any():
+                return mbap.exception_pdu(function_code, mbap.GATEWAY_TARGET_FAILED)
+        return response(values)
+
+    async def refresh(self, function_code, address, count):
+        """Перечитывание блоков плана, пересекающихся с интервалом адресов; False при ошибке."""
+        flights = [self.flight(function_code, start, block_count)
+                   for start, block_count in self.blocks[function_code]
+                   if start < address + count and address < start + block_count]
+        return all(await asyncio.gather(*flights))
+
+    async def flight(self, function_code, start, count):
+        """Ожидание чтения блока: присоединение к выполняемому или запуск нового."""
+        key = function_code, start, count
+        future = self.in_flight.get(key)
+        if future is None:
+            method = "read_holding_registers" if function_code == mbap.READ_HOLDING_REGISTERS else "read_coils"
+            future = asyncio.wrap_future(self.poller.forward(method, start, count))
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            self.poller.metrics.increment("gateway_reads")
+        else:
+            self.poller.metrics.increment("gateway_coalesced")
+        try:
+            # shield: отмена запроса одной панели не отменяет общее чтение
+            response = await asyncio.shield(future)
+        except Exception as e:
+            logger.error(f"Ошибка чтения блока {start}-{start + count - 1} из контроллера: {e}")
+            return False
+        return bool(response) and len(response) == count
+
+    async def forward(self, method, *args):
+        """Передача записи в контроллер через поток опроса."""
+        try:
+            return await asyncio.wrap_future(self.poller.forward(method, *args))
+        except Exception as e:
+            logger.error(f"Ошибка передачи записи {method} в контроллер: {e}")
+            return None
+
+    async def handle(self, pdu):
+        """Обработка PDU запроса панели и формирование PDU ответа."""
+        function_code = pdu[0]
+        try:
+            if function_code in (mbap.READ_HOLDING_REGISTERS, mbap.READ_COILS):
+                address, count = struct.unpack_from('>HH', pdu, 1)
+                return await self.read_response(function_code, address, count)
+            if function_code == mbap.WRITE_SINGLE_COIL:
+                address, value = struct.unpack_from('>HH', pdu, 1)
+                if value not in (0x0000, 0xFF00):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+                if address >= len(self.image.coils):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+                if await self.forward("write_single_coil", address, value == 0xFF00):
+                    return pdu[:5]
+                return mbap.exception_pdu(function_code, mbap.GATEWAY_TARGET_FAILED)
+            if function_code == mbap.WRITE_MULTIPLE_REGISTERS:
+                address, count, byte_count = struct.unpack_from('>HHB', pdu, 1)
+                if not 1 <= count <= 123 or byte_count != count * 2:
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+                if address + count > len(self.image.registers):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+                registers = list(struct.unpack_from(f'>{count}H', pdu, 6))
+                if await self.forward("write_multiple_registers", address, registers):
+                    return pdu[:5]
+                return mbap.exception_pdu(function_code, mbap.GATEWAY_TARGET_FAILED)
+        except struct.error:
+            return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+        return mbap.exception_pdu(function_code, mbap.ILLEGAL_FUNCTION)
+
+    async def respond(self, writer, transaction_id, unit_id, pdu):
+        adu = mbap.build_adu(transaction_id, unit_id, await self.handle(pdu))
+        if not writer.is_closing():
+            writer.write(adu)
+
+    async def serve_client(self, reader, writer):
+        """Обслуживание одного соединения панели; запросы обрабатываются конвейерно."""
+        tasks = set()
+        self._writers.add(writer)
+        try:
+            while True:
+                transaction_id, unit_id, pdu = await mbap.read_adu(reader)
+                self.requests += 1
+                task = asyncio.create_task(self.respond(writer, transaction_id, unit_id, pdu))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._writers.discard(writer)
+            writer.close()
+
+    async def serve(self, host="0.0.0.0", port=502):
+        """Запуск сервера шлюза в текущем цикле событий."""
+        self._server = await asyncio.start_server(self.serve_client, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Шлюз Modbus слушает {host}:{self.port}")
+        return self._server
+
+    def start(self, host="0.0.0.0", port=502):
+        """Запуск потока опроса и сервера шлюза в фоновом потоке со своим циклом событий."""
+        self.poller.start()
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.serve(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="modbus-gateway", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop(self):
+        """Остановка сервера шлюза, затем потока опроса и соединения с контроллером."""
+        if self._loop is not None:
+            async def shutdown():
+                self._server.close()
+                for writer in list(self._writers):
+                    writer.close()
+                await self._server.wait_closed()
+
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+        self.poller.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Шлюз Modbus TCP: одно соединение с контроллером для всех панелей")
+    parser.add_argument("--map", default=DEFAULT_MAP_PATH, help="файл карты регистров")
+    parser.add_argument("--host", help="адрес контроллера вместо указанного в карте регистров")
+    parser.add_argument("--port", type=int, help="порт контроллера вместо указанного в карте регистров")
+    parser.add_argument("--listen-host", help="адрес шлюза вместо указанного в карте регистров")
+    parser.add_argument("--listen-port", type=int, help="порт шлюза вместо указанного в карте регистров")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    register_map = load_register_map(args.map)
+    device = dict(register_map.device)
+    if args.host:
+        device["host"] = args.host
+    if args.port:
+        device["port"] = args.port
+    # Из настроек шлюза берутся только адрес и порт: окна свежести читает ModbusGateway
+    settings = register_map.gateway or {}
+    listen = {"host": settings.get("host", "0.0.0.0"), "port": settings.get("port", 502)}
+    if args.listen_host:
+        listen["host"] = args.listen_host
+    if args.listen_port is not None:
+        listen["port"] = args.listen_port
+
+    client = ModbusClient(**device, auto_open=False)
+    gateway = ModbusGateway(client, register_map)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    gateway.start(**listen)
+    metrics_server = None
+    if register_map.metrics:
+        try:
+            metrics_server = MetricsServer(gateway.poller, register_map, **register_map.metrics)
+            metrics_server.start()
+        except OSError as e:
+            logger.error(f"Не удалось запустить сервер метрик: {e}")
+    logger.info(f"Шлюз к {device['host']}:{device['port']} запущен.")
+
+    stop_event.wait()
+
+    # Остановка сервера метрик, шлюза, потока опроса и закрытие соединения с контроллером
+    if metrics_server is not None:
+        metrics_server.stop()
+    gateway.stop()
+    logger.info("Соединение закрыто.")
+
+
+if __name__ == '__main__':
+    main()
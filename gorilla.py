@@ -0,0 +1,225 @@
+import argparse
+import struct
+import time
+
+import numpy as np
+
+# Заголовок сжатого блока: количество отсчётов, первая метка времени, биты первого значения, первое качество
+# и длины потоков в байтах (кроме последнего, который занимает остаток блока)
+HEADER = struct.Struct('<IqIB8I')
+
+# Биты разности второго порядка меток времени по номеру диапазона (2 бита на ненулевую разность)
+TIMESTAMP_WIDTHS = np.array([7, 9, 12, 64])
+
+# Биты заголовка окна значащих битов XOR: начальные нули и длина окна минус один
+WINDOW_BITS = 5
+
+
+class BitWriter:
+    """Запись последовательности битов в буфер байт."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value, count):
+        self._acc = (self._acc << count) | (value & ((1 << count) - 1))
+        self._bits += count
+        while self._bits >= 8:
+            self._bits -= 8
+            self.buffer.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self):
+        """Содержимое буфера, последний байт дополнен нулями."""
+        if self._bits:
+            return bytes(self.buffer) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self.buffer)
+
+
+def compress(timestamps, values, quality):
+    """Сжатие отсчётов по схеме Gorilla (Facebook, 2015).
+
+    Метки времени кодируются разностью второго порядка (при равномерном
+    опросе - один бит на отсчёт), значения float32 - XOR с предыдущим
+    значением (неизменное значение - один бит), качество - один бит, если
+    оно не изменилось. В отличие от исходной схемы, управляющие биты
+    фиксированной длины и поля переменной длины пишутся в отдельные потоки:
+    так распаковка выполняется операциями NumPy над всем блоком, без цикла
+    по отсчётам. Возвращает байты сжатого блока.
+    """
+    count = len(timestamps)
+    timestamps = np.asarray(timestamps, dtype=np.int64).tolist()
+    words = np.asarray(values, dtype='<f4').view('<u4').tolist()
+    quality = np.asarray(quality, dtype=np.uint8).tolist()
+    # Потоки: признак ненулевой разности меток, диапазон, разность; признак изменения значения,
+    # признак нового окна, заголовки окон, значащие биты XOR; признак изменения качества, качество
+    streams = [BitWriter() for _ in range(9)]
+    (time_flags, time_buckets, time_payload, value_flags, window_flags, windows, value_payload,
+     quality_flags, quality_payload) = streams
+    previous_delta = 0
+    leading, length = 33, 0
+    for i in range(1, count):
+        delta = timestamps[i] - timestamps[i - 1]
+        dod = delta - previous_delta
+        previous_delta = delta
+        time_flags.write(dod != 0, 1)
+        if dod:
+            for bucket, width in enumerate(TIMESTAMP_WIDTHS.tolist()):
+                if width == 64 or -(1 << (width - 1)) <= dod < 1 << (width - 1):
+                    time_buckets.write(bucket, 2)
+                    time_payload.write(dod, width)
+                    break
+
+        xor = words[i] ^ words[i - 1]
+        value_flags.write(xor != 0, 1)
+        if xor:
+            new_leading = 32 - xor.bit_length()
+            trailing = (xor & -xor).bit_length() - 1
+            if new_leading >= leading and trailing >= 32 - leading - length:
+                # Значащие биты помещаются в окно предыдущего значения
+                window_flags.write(0, 1)
+                value_payload.write(xor >> (32 - leading - length), length)
+            else:
+                leading, length = min(new_leading, 31), 32 - min(new_leading, 31) - trailing
+                window_flags.write(1, 1)
+                windows.write(leading, WINDOW_BITS)
+                windows.write(length - 1, WINDOW_BITS)
+                value_payload.write(xor >> trailing, length)
+
+        quality_flags.write(quality[i] != quality[i - 1], 1)
+        if quality[i] != quality[i - 1]:
+            quality_payload.write(quality[i], 8)
+    data = [stream.getvalue() for stream in streams]
+    if not count:
+        return HEADER.pack(0, 0, 0, 0, *[0] * 8)
+    return HEADER.pack(count, timestamps[0], words[0], quality[0], *map(len, data[:-1])) + b"".join(data)
+
+
+def read_bits(stream, count):
+    """Первые count битов потока массивом 0/1."""
+    return np.unpackbits(np.frombuffer(stream, dtype=np.uint8), count=count)
+
+
+def read_fields(stream, widths):
+    """Поля переменной длины (до 57 бит) подряд из потока: массив uint64.
+
+    Каждое поле читается из восьми байт, начиная с байта, содержащего его
+    первый бит (представление буфера с шагом в один байт), сдвигом и маской -
+    одной операцией для всех полей.
+    """
+    widths = np.asarray(widths, dtype=np.uint64)
+    offsets = np.cumsum(widths, dtype=np.uint64) - widths
+    buffer = np.frombuffer(bytes(stream) + bytes(8), dtype=np.uint8)
+    words = np.ndarray(shape=(len(buffer) - 7,), dtype='>u8', buffer=buffer, strides=(1,))
+    chunks = words[offsets >> np.uint64(3)].astype(np.uint64)
+    return (chunks >> (np.uint64(64) - (offsets & np.uint64(7)) - widths)) & ((np.uint64(1) << widths) - np.uint64(1))
+
+
+def read_signed(stream, widths):
+    """Поля в дополнительном коде (до 64 бит) подряд из потока: массив int64."""
+    widths = np.asarray(widths, dtype=np.int64)
+    # Поля шире 32 бит читаются двумя половинами
+    halves = np.where(widths > 32, 2, 1)
+    parts = np.repeat(widths - (halves - 1) * 32, halves)
+    parts[np.cumsum(halves)[halves == 2] - 1] = 32
+    raw = read_fields(stream, parts)
+    starts = np.cumsum(halves) - halves
+    fields = raw[starts]
+    wide = halves == 2
+    fields[wide] = (fields[wide] << np.uint64(32)) | raw[starts[wide] + 1]
+    values = fields.view(np.int64)
+    narrow = ~wide & (fields >= (np.uint64(1) << (widths - 1).astype(np.uint64)))
+    values[narrow] -= np.int64(1) << widths[narrow]
+    return values
+
+
+def decompress(data):
+    """Распаковка блока в массивы (метки времени, значения, качество) операциями NumPy."""
+    count, timestamp, word, first_quality, *lengths = HEADER.unpack_from(data)
+    if not count:
+        return np.empty(0, np.int64), np.empty(0, np.float32), np.empty(0, np.uint8)
+    bounds = np.cumsum([HEADER.size, *lengths]).tolist()
+    (time_flags, time_buckets, time_payload, value_flags, window_flags, windows, value_payload,
+     quality_flags, quality_payload) = (data[start:end] for start, end in zip(bounds, bounds[1:] + [len(data)]))
+
+    # Метки времени: разности второго порядка -> разности -> метки
+    changed = read_bits(time_flags, count - 1).astype(bool)
+    buckets = read_bits(time_buckets, 2 * int(changed.sum())).reshape(-1, 2) @ np.array([2, 1])
+    dods = np.zeros(count - 1, dtype=np.int64)
+    dods[changed] = read_signed(time_payload, TIMESTAMP_WIDTHS[buckets])
+    timestamps = np.empty(count, dtype=np.int64)
+    timestamps[0] = timestamp
+    timestamps[1:] = timestamp + np.cumsum(np.cumsum(dods))
+
+    # Значения: окно каждого XOR - последнее объявленное окно, XOR накапливаются от первого значения
+    changed = read_bits(value_flags, count - 1).astype(bool)
+    new_window = read_bits(window_flags, int(changed.sum()))
+    header = read_fields(windows, np.full(2 * int(new_window.sum()), WINDOW_BITS)).reshape(-1, 2).astype(np.int64)
+    window = np.cumsum(new_window, dtype=np.int64) - 1
+    leading, length = header[window, 0], header[window, 1] + 1
+    xors = np.zeros(count, dtype=np.uint64)
+    xors[0] = word
+    xors[1:][changed] = read_fields(value_payload, length) << (32 - leading - length).astype(np.uint64)
+    values = np.bitwise_xor.accumulate(xors).astype('<u4').view('<f4')
+
+    # Качество: последнее изменённое значение
+    changed = read_bits(quality_flags, count - 1)
+    qualities = np.concatenate(([first_quality], np.frombuffer(quality_payload, dtype=np.uint8)))
+    quality = qualities[np.concatenate(([0], np.cumsum(changed, dtype=np.int64)))]
+    return timestamps, values, quality
+
+
+def simulator_traces(hours, seed=0):
+    """Отсчёты всех регистровых тегов карты раз в секунду с тепловой модели имитатора."""
+    from plc_simulator import PlcSimulator
+    from register_map import load_register_map
+    from register_image import compile_reads
+    from thermal_model import HeatingModel
+
+    register_map = load_register_map()
+    simulator = PlcSimulator.from_register_map(register_map, model=HeatingModel(1, seed=seed), seed=seed)
+    decoders = compile_reads(register_map.register_tags)
+    rng = np.random.default_rng(seed)
+    samples = hours * 3600
+    # Метки времени опроса раз в секунду с разбросом в несколько миллисекунд
+    timestamps = 1_700_000_000_000 + np.arange(samples, dtype=np.int64) * 1000 + rng.integers(0, 5, samples)
+    traces = {tag.name: np.empty(samples, dtype=np.float32) for tag in register_map.register_tags}
+    for i in range(samples):
+        simulator.step_model(1.0)
+        registers = simulator.registers[0]
+        for decoder in decoders:
+            for name, value in decoder.decode(registers[decoder.start:decoder.start + decoder.count]).items():
+                traces[name][i] = value
+    return timestamps, traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сжатие архива по схеме Gorilla на данных имитатора контроллера")
+    parser.add_argument("--hours", type=int, default=6, help="длительность записи, ч")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timestamps, traces = simulator_traces(args.hours, args.seed)
+    quality = np.ones(len(timestamps), dtype=np.uint8)
+    record_size = 13  # метка времени int64, значение float32, качество
+    print(f"{'тег':<26}{'байт/отсчёт':>12}{'сжатие':>9}{'распаковка, мс':>16}")
+    total = 0
+    elapsed = 0.0
+    for name, values in traces.items():
+        data = compress(timestamps, values, quality)
+        start = time.perf_counter()
+        restored = decompress(data)
+        duration = time.perf_counter() - start
+        assert np.array_equal(restored[0], timestamps) and np.array_equal(restored[1], values)
+        total += len(data)
+        elapsed += duration
+        print(f"{name:<26}{len(data) / len(timestamps):>12.2f}{record_size * len(timestamps) / len(data):>8.1f}x"
+              f"{duration * 1000:>16.1f}")
+    samples = len(timestamps) * len(traces)
+    print(f"{'всего':<26}{total / samples:>12.2f}{record_size * samples / total:>8.1f}x{elapsed * 1000:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
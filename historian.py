@@ -0,0 +1,256 @@
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+
+from historian_store import HistorianStore, DAY_MS
+
+logger = logging.getLogger(__name__)
+
+# Качество отсчёта: тег не читался в этом цикле, прочитан, ошибка чтения
+QUALITY_MISSING = 0
+QUALITY_GOOD = 1
+QUALITY_BAD = 2
+
+# Глубина истории по умолчанию: неделя
+DEFAULT_RETENTION = 7 * 24 * 3600
+
+# Минимальная ёмкость кольца (классы без периода и внеочередные чтения)
+MIN_CAPACITY = 4096
+
+# Запас ёмкости на внеочередные чтения тегов (после записи, переподключения)
+CAPACITY_MARGIN = 1.05
+
+
+def now_ms():
+    """Текущее время в миллисекундах Unix."""
+    return time.time_ns() // 1_000_000
+
+
+class RingBuffer:
+    """Кольцевой буфер отсчётов группы тегов, опрашиваемых вместе.
+
+    Массивы выделяются заранее: метки времени int64 (мс Unix) на отсчёт,
+    значения float32 и байт качества на отсчёт и тег. Добавление - запись
+    строки по индексу головы, O(1) без создания объектов на отсчёт; при
+    заполнении перезаписываются самые старые отсчёты.
+    """
+
+    def __init__(self, names, capacity):
+        self.names = list(names)
+        self.columns = {name: column for column, name in enumerate(self.names)}
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        # Нули, а не NaN: страницы памяти выделяются по мере заполнения кольца
+        self.values = np.zeros((capacity, len(self.names)), dtype=np.float32)
+        self.quality = np.zeros((capacity, len(self.names)), dtype=np.uint8)
+        self.head = 0
+        self.size = 0
+        self.count = 0
+        self.flushed = 0
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.values.nbytes + self.quality.nbytes
+
+    def append(self, timestamp, values, quality):
+        """Добавление строки отсчётов: values и quality по столбцам тегов."""
+        with self.lock:
+            if self.size:
+                # Метки времени в кольце не убывают, даже если часы перевели назад
+                timestamp = max(timestamp, self.timestamps[self.head - 1])
+            self.timestamps[self.head] = timestamp
+            self.values[self.head] = values
+            self.quality[self.head] = quality
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self.count += 1
+
+    def _segments(self):
+        """Срезы кольца в хронологическом порядке (не более двух)."""
+        if self.size < self.capacity:
+            return [slice(0, self.size)]
+        return [slice(self.head, self.capacity), slice(0, self.head)]
+
+    def oldest(self):
+        """Метка времени самого старого отсчёта в кольце или None."""
+        with self.lock:
+            return int(self.timestamps[self._segments()[0].start]) if self.size else None
+
+    def take_unflushed(self):
+        """Строки, добавленные после предыдущего вызова: (метки времени, значения, качество)."""
+        with self.lock:
+            pending = min(self.count - self.flushed, self.size)
+            rows = (np.arange(self.head - pending, self.head)) % self.capacity
+            self.flushed = self.count
+            return self.timestamps[rows], self.values[rows], self.quality[rows]
+
+    def window(self, name, start=None, end=None):
+        """Отсчёты тега в интервале [start, end) мс: (метки времени, значения, качество).
+
+        Границы ищутся бинарным поиском по упорядоченным сегментам кольца,
+        отсчёты, в которых тег не читался, отбрасываются.
+        """
+        column = self.columns[name]
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        with self.lock:
+            parts = []
+            for segment in self._segments():
+                timestamps = self.timestamps[segment]
+                low, high = np.searchsorted(timestamps, [start, end])
+                rows = slice(segment.start + low, segment.start + high)
+                parts.append((self.timestamps[rows], self.values[rows, column], self.quality[rows, column]))
+        timestamps, values, quality = (np.concatenate(arrays) for arrays in zip(*parts))
+        present = quality != QUALITY_MISSING
+        return timestamps[present], values[present], quality[present]
+
+    def last(self, name):
+        """Последний прочитанный отсчёт тега: (метка времени, значение, качество) или None."""
+        column = self.columns[name]
+        with self.lock:
+            for offset in range(1, self.size + 1):
+                row = (self.head - offset) % self.capacity
+                if self.quality[row, column] != QUALITY_MISSING:
+                    return int(self.timestamps[row]), float(self.values[row, column]), int(self.quality[row, column])
+        return None
+
+
+class Historian:
+    """Оперативный архив значений регистров в кольцевых буферах NumPy.
+
+    Теги одного класса опроса читаются вместе, поэтому хранятся в одном
+    кольце с общей меткой времени; ёмкость кольца рассчитана на retention
+    секунд при периоде класса. Неделя отсчётов раз в секунду для быстрых
+    тегов панели занимает несколько десятков МБ.
+
+    Если задано хранилище store (HistorianStore), новые строки колец раз в
+    flush_interval секунд дописываются в файлы на диске отдельным потоком
+    (запись с fsync не задерживает опрос), так что при сбое
+    теряется не более последнего интервала; запросы старше кольца
+    выполняются по файлам. С compress файлы завершённых суток сжимаются
+    по схеме Gorilla в фоновом потоке.
+    """
+
+    def __init__(self, tags, poll_classes, retention=DEFAULT_RETENTION, store=None, flush_interval=5.0,
+                 compress=False):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self._sealed_day = None
+        self._sealer = None
+        self.rings = {}
+        self.tag_rings = {}
+        class_tags = {}
+        for tag in tags:
+            class_tags.setdefault(tag.poll, []).append(tag.name)
+        for poll_class, names in class_tags.items():
+            period = poll_classes[poll_class]
+            capacity = MIN_CAPACITY
+            if period:
+                capacity = max(capacity, math.ceil(retention / period * CAPACITY_MARGIN))
+            ring = RingBuffer(names, capacity)
+            self.rings[poll_class] = ring
+            for name in names:
+                self.tag_rings[name] = ring
+        self._stop_event = threading.Event()
+        self._writer = None
+        if store is not None:
+            self._writer = threading.Thread(target=self._run, name="historian-writer", daemon=True)
+            self._writer.start()
+
+    @classmethod
+    def from_register_map(cls, register_map):
+        """Архив всех регистровых тегов карты с параметрами из раздела "historian"."""
+        config = register_map.historian or {}
+        store = HistorianStore(config["path"]) if "path" in config else None
+        return cls(register_map.register_tags, register_map.poll_classes, config.get("retention", DEFAULT_RETENTION),
+                   store, config.get("flush_interval", 5.0), config.get("compress", False))
+
+    @property
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self.rings.values())
+
+    def record(self, tags, values, timestamp=None):
+        """Запись результата цикла опроса.
+
+        tags - прочитанные в цикле теги, values - {имя тега: значение};
+        теги без значения записываются с качеством QUALITY_BAD.
+        """
+        timestamp = now_ms() if timestamp is None else timestamp
+        rows = {}
+        for tag in tags:
+            ring = self.tag_rings.get(tag.name)
+            if ring is None:
+                continue
+            if ring not in rows:
+                rows[ring] = (np.full(len(ring.names), np.nan, dtype=np.float32),
+                              np.zeros(len(ring.names), dtype=np.uint8))
+            row_values, row_quality = rows[ring]
+            column = ring.columns[tag.name]
+            value = values.get(tag.name)
+            if value is None:
+                row_quality[column] = QUALITY_BAD
+            else:
+                row_values[column] = value
+                row_quality[column] = QUALITY_GOOD
+        for ring, (row_values, row_quality) in rows.items():
+            ring.append(timestamp, row_values, row_quality)
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи архива: {e}")
+
+    def flush(self):
+        """Дописывание новых отсчётов колец в хранилище на диске."""
+        for ring in self.rings.values():
+            timestamps, values, quality = ring.take_unflushed()
+            for column, name in enumerate(ring.names):
+                present = quality[:, column] != QUALITY_MISSING
+                try:
+                    self.store.append(name, timestamps[present], values[present, column], quality[present, column])
+                except OSError as e:
+                    logger.error(f"Ошибка записи архива тега {name}: {e}")
+        today = now_ms() // DAY_MS
+        if self.compress and today != self._sealed_day and not (self._sealer and self._sealer.is_alive()):
+            # Все отсчёты прошлых суток уже дописаны: их файлы можно сжать
+            self._sealed_day = today
+            self._sealer = threading.Thread(target=self.store.seal_before, args=(today,), name="historian-sealer",
+                                            daemon=True)
+            self._sealer.start()
+
+    def close(self):
+        """Остановка потока записи и запись оставшихся отсчётов в хранилище."""
+        if self._writer is not None:
+            self._stop_event.set()
+            self._writer.join()
+            self._writer = None
+            self.flush()
+
+    def window(self, name, start=None, end=None):
+        """Отсчёты тега в интервале [start, end) мс: (метки времени, значения, качество).
+
+        Часть интервала, которая есть в кольце, читается из памяти, более
+        ранняя - из хранилища на диске (если оно задано).
+        """
+        ring = self.tag_rings[name]
+        oldest = ring.oldest()
+        if self.store is None or start is None or (oldest is not None and start >= oldest):
+            return ring.window(name, start, end)
+        boundary = oldest if oldest is not None else now_ms()
+        end_ms = boundary if end is None else min(end, boundary)
+        stored = self.store.window(name, start, end_ms)
+        if end is not None and end <= boundary:
+            return stored
+        recent = ring.window(name, boundary, end)
+        return tuple(np.concatenate(parts) for parts in zip(stored, recent))
+
+    def last(self, name):
+        """Последний отсчёт тега или None."""
+        return self.tag_rings[name].last(name)
@@ -0,0 +1,248 @@
+import calendar
+import collections
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from gorilla import compress, decompress
+
+logger = logging.getLogger(__name__)
+
+# Запись файла архива: метка времени (мс Unix), значение, качество - 13 байт
+RECORD_DTYPE = np.dtype([("timestamp", "<i8"), ("value", "<f4"), ("quality", "u1")])
+
+# Шаг разреженного индекса времени, записей
+INDEX_STRIDE = 1024
+
+# Длительность суток, мс
+DAY_MS = 86400 * 1000
+
+# Расширения файлов суток: записи фиксированной длины и сжатый запечатанный блок
+RECORDS_SUFFIX = ".dat"
+SEALED_SUFFIX = ".gor"
+
+# Заголовок запечатанного файла: сколько первых записей файла записей суток уже вошло в сжатый блок
+SEALED_HEADER = struct.Struct('<Q')
+
+# Количество распакованных запечатанных суток (тег, сутки), хранимых в памяти для повторных запросов
+SEALED_CACHE_SIZE = 16
+
+# Количество файлов записей суток, одновременно отображённых в память
+FILES_CACHE_SIZE = 64
+
+
+def day_name(day):
+    """Имя файла суток (UTC) без расширения по номеру суток от начала эпохи."""
+    return time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+
+
+def parse_day(name):
+    """Номер суток по имени файла суток."""
+    return calendar.timegm(time.strptime(name, "%Y-%m-%d")) // 86400
+
+
+class HistorianStore:
+    """Архив значений тегов на диске: файл с записями фиксированной длины на тег и сутки.
+
+    Файлы только дополняются, записи идут по возрастанию времени, поэтому
+    число записей определяется размером файла (неполная запись после сбоя
+    не читается и обрезается перед следующим дописыванием), а чтение интервала - срез отображённого в память файла
+    без разбора. Границы интервала ищутся по разреженному индексу (метка
+    времени каждой INDEX_STRIDE-й записи) и затем внутри одного шага.
+
+    Завершённые сутки можно запечатать (seal): файл записей заменяется
+    блоком, сжатым по схеме Gorilla; последние распакованные сутки
+    хранятся в памяти. Заголовок сжатого файла хранит количество записей
+    файла записей, уже вошедших в блок: если после замены блока файл
+    записей не успели удалить, эти записи не читаются и не сжимаются
+    повторно. При создании нового файла записей счётчик обнуляется.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self._files = collections.OrderedDict()
+        self._files_lock = threading.Lock()
+        self._sealed = collections.OrderedDict()
+        self._sealed_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name, day, suffix=RECORDS_SUFFIX):
+        return os.path.join(self.root, name, day_name(day) + suffix)
+
+    def append(self, name, timestamps, values, quality):
+        """Дописывание отсчётов тега (массивы по возрастанию времени) в файлы суток."""
+        if not len(timestamps):
+            return
+        records = np.empty(len(timestamps), dtype=RECORD_DTYPE)
+        records["timestamp"] = timestamps
+        records["value"] = values
+        records["quality"] = quality
+        days = records["timestamp"] // DAY_MS
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        with self.lock:
+            for chunk in np.split(records, bounds):
+                with open(self.path(name, int(chunk["timestamp"][0] // DAY_MS)), "ab") as f:
+                    size = f.seek(0, os.SEEK_END)
+                    if not size:
+                        self._reset_consumed(name, int(chunk["timestamp"][0] // DAY_MS))
+                    torn = size % RECORD_DTYPE.itemsize
+                    if torn:
+                        # Неполная запись после сбоя: иначе все следующие записи суток сместятся
+                        logger.error(f"Архив {name}: отброшена неполная запись ({torn} байт) в {f.name}")
+                        f.truncate(size - torn)
+                    f.write(chunk.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _open(self, name, day):
+        """Записи файла суток (отображение в память) и разреженный индекс; None, если файла нет."""
+        path = self.path(name, day)
+        with self._files_lock:
+            try:
+                count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+            except OSError:
+                return None
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == count:
+                self._files.move_to_end(path)
+                return cached[1:]
+            if not count:
+                return None
+            records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+            index = np.array(records["timestamp"][::INDEX_STRIDE])
+            self._files[path] = (count, records, index)
+            self._files.move_to_end(path)
+            if len(self._files) > FILES_CACHE_SIZE:
+                self._files.popitem(last=False)
+        return records, index
+
+    @staticmethod
+    def _bound(records, index, timestamp):
+        """Позиция первой записи с меткой времени не меньше timestamp."""
+        block = int(np.searchsorted(index, timestamp))
+        if block == 0:
+            return 0
+        base = (block - 1) * INDEX_STRIDE
+        return base + int(np.searchsorted(records["timestamp"][base:base + INDEX_STRIDE], timestamp))
+
+    def _reset_consumed(self, name, day):
+        """Обнуление счётчика записей в заголовке сжатого блока перед созданием файла записей."""
+        sealed = self.path(name, day, SEALED_SUFFIX)
+        try:
+            with open(sealed, "r+b") as f:
+                if SEALED_HEADER.unpack(f.read(SEALED_HEADER.size))[0]:
+                    f.seek(0)
+                    f.write(SEALED_HEADER.pack(0))
+                    f.flush()
+                    os.fsync(f.fileno())
+        except FileNotFoundError:
+            pass
+
+    def read_sealed(self, name, day):
+        """Запечатанные сутки: (записей файла записей в блоке, записи) или None, если блока нет."""
+        path = self.path(name, day, SEALED_SUFFIX)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        consumed, = SEALED_HEADER.unpack_from(data)
+        with self._sealed_lock:
+            cached = self._sealed.get(path)
+            if cached is not None and cached[0] == data[SEALED_HEADER.size:]:
+                self._sealed.move_to_end(path)
+                return consumed, cached[1]
+        timestamps, values, quality = decompress(data[SEALED_HEADER.size:])
+        records = np.empty(len(timestamps), dtype=RECORD_DTYPE)
+        records["timestamp"], records["value"], records["quality"] = timestamps, values, quality
+        with self._sealed_lock:
+            self._sealed[path] = (data[SEALED_HEADER.size:], records)
+            if len(self._sealed) > SEALED_CACHE_SIZE:
+                self._sealed.popitem(last=False)
+        return consumed, records
+
+    def seal(self, name, day):
+        """Замена файла записей суток сжатым блоком.
+
+        Сжатие выполняется без блокировки; если за это время в файл были
+        дописаны записи, файл остаётся несжатым до следующего вызова.
+        Записи, дописанные после прошлого сжатия, объединяются с блоком.
+        """
+        path = self.path(name, day)
+        sealed = self.path(name, day, SEALED_SUFFIX)
+        size = os.path.getsize(path)
+        count = size // RECORD_DTYPE.itemsize
+        previous = self.read_sealed(name, day)
+        consumed, old = previous if previous is not None else (0, np.empty(0, dtype=RECORD_DTYPE))
+        records = np.concatenate((old, np.fromfile(path, dtype=RECORD_DTYPE, count=count)[consumed:]))
+        data = None
+        if count > consumed or previous is None:
+            data = SEALED_HEADER.pack(count) + compress(records["timestamp"], records["value"], records["quality"])
+        with self.lock:
+            if os.path.getsize(path) != size:
+                logger.debug(f"Архив {name} за {day_name(day)} дописан во время сжатия, сжатие отложено")
+                return False
+            if data is not None:
+                with open(sealed + ".tmp", "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(sealed + ".tmp", sealed)
+            # Сбой до удаления безопасен: заголовок блока отмечает записи файла как уже сжатые
+            with self._files_lock:
+                # Отображение снимается до удаления, чтобы не держать открытым удалённый файл
+                self._files.pop(path, None)
+                os.remove(path)
+        logger.debug(f"Архив {name} за {day_name(day)} сжат: {len(records)} записей")
+        return True
+
+    def seal_before(self, day):
+        """Сжатие файлов записей всех тегов за сутки до day."""
+        for name in os.listdir(self.root):
+            for file_name in sorted(os.listdir(os.path.join(self.root, name))):
+                stem, suffix = os.path.splitext(file_name)
+                if suffix != RECORDS_SUFFIX or parse_day(stem) >= day:
+                    continue
+                try:
+                    self.seal(name, parse_day(stem))
+                except (OSError, ValueError) as e:
+                    logger.error(f"Ошибка сжатия архива {name} за {stem}: {e}")
+
+    def slices(self, name, start, end):
+        """Записи тега в интервале [start, end) мс по файлам суток.
+
+        Для файлов записей - срезы отображения в память без копирования,
+        для запечатанных суток - срезы распакованных массивов.
+        """
+        slices = []
+        for day in range(start // DAY_MS, (end - 1) // DAY_MS + 1):
+            consumed = 0
+            sealed = self.read_sealed(name, day)
+            if sealed is not None:
+                consumed, records = sealed
+                low, high = np.searchsorted(records["timestamp"], [start, end])
+                if high > low:
+                    slices.append(records[low:high])
+            opened = self._open(name, day)
+            if opened is None:
+                continue
+            records, index = opened
+            low = max(self._bound(records, index, start), consumed)
+            high = self._bound(records, index, end)
+            if high > low:
+                slices.append(records[low:high])
+        return slices
+
+    def window(self, name, start, end):
+        """Отсчёты тега в интервале [start, end) мс: (метки времени, значения, качество)."""
+        slices = self.slices(name, start, end)
+        if not slices:
+            return np.empty(0, np.int64), np.empty(0, np.float32), np.empty(0, np.uint8)
+        records = np.concatenate(slices)
+        return records["timestamp"], records["value"], records["quality"]
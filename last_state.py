@@ -0,0 +1,27 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def save_state(path, values, coil_mask, timestamp):
+    """Сохранение последнего прочитанного состояния (атомарная замена файла)."""
+    data = {"timestamp": timestamp, "coils": coil_mask, "values": values}
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporary, path)
+
+
+def load_state(path):
+    """Загрузка сохранённого состояния: (значения {имя тега: значение}, маска катушек, метка времени мс) или None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data["values"], data["coils"], data["timestamp"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Ошибка чтения сохранённого состояния {path}: {e}")
+        return None
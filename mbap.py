@@ -0,0 +1,81 @@
+import struct
+
+# Заголовок MBAP: идентификатор транзакции, протокол, длина, идентификатор устройства
+MBAP_HEADER = struct.Struct('>HHHB')
+
+# Коды функций Modbus
+READ_COILS = 0x01
+READ_HOLDING_REGISTERS = 0x03
+WRITE_SINGLE_COIL = 0x05
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+# Коды исключений Modbus
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+GATEWAY_TARGET_FAILED = 0x0B
+
+
+def build_adu(transaction_id, unit_id, pdu):
+    """Формирование кадра Modbus TCP (MBAP заголовок + PDU)."""
+    return MBAP_HEADER.pack(transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+
+
+async def read_adu(reader):
+    """Чтение одного кадра Modbus TCP: (транзакция, устройство, PDU)."""
+    header = await reader.readexactly(MBAP_HEADER.size)
+    transaction_id, _, length, unit_id = MBAP_HEADER.unpack(header)
+    pdu = await reader.readexactly(length - 1)
+    return transaction_id, unit_id, pdu
+
+
+def exception_pdu(function_code, exception_code):
+    """PDU ответа с исключением Modbus."""
+    return struct.pack('>BB', function_code | 0x80, exception_code)
+
+
+def read_registers_request(address, count):
+    """PDU запроса FC03."""
+    return struct.pack('>BHH', READ_HOLDING_REGISTERS, address, count)
+
+
+def read_coils_request(address, count):
+    """PDU запроса FC01."""
+    return struct.pack('>BHH', READ_COILS, address, count)
+
+
+def write_coil_request(address, value):
+    """PDU запроса FC05."""
+    return struct.pack('>BHH', WRITE_SINGLE_COIL, address, 0xFF00 if value else 0x0000)
+
+
+def write_registers_request(address, registers):
+    """PDU запроса FC16."""
+    count = len(registers)
+    return struct.pack(f'>BHHB{count}H', WRITE_MULTIPLE_REGISTERS, address, count, count * 2, *registers)
+
+
+def registers_response(registers):
+    """PDU ответа FC03 со значениями регистров."""
+    count = len(registers)
+    return struct.pack(f'>BB{count}H', READ_HOLDING_REGISTERS, count * 2, *registers)
+
+
+def coils_response(bits):
+    """PDU ответа FC01 с упакованными состояниями катушек."""
+    packed = bytearray((len(bits) + 7) // 8)
+    for index, bit in enumerate(bits):
+        if bit:
+            packed[index // 8] |= 1 << (index % 8)
+    return struct.pack('>BB', READ_COILS, len(packed)) + bytes(packed)
+
+
+def decode_registers(pdu):
+    """Значения регистров из PDU ответа FC03."""
+    count = pdu[1] // 2
+    return list(struct.unpack_from(f'>{count}H', pdu, 2))
+
+
+def decode_bits(pdu, count):
+    """Состояния катушек из PDU ответа FC01."""
+    return [bool(pdu[2 + index // 8] >> (index % 8) & 1) for index in range(count)]
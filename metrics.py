@@ -0,0 +1,176 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+
+from pyModbusTCP.constants import MB_NO_ERR, MB_TIMEOUT_ERR, MB_EXCEPT_ERR
+
+import mbap
+
+# Относительная точность корзин гистограммы задержек (2 %)
+HISTOGRAM_PRECISION = 0.02
+
+# Процентили, выводимые в снимке метрик
+PERCENTILES = (50, 90, 99)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами (в духе HDR).
+
+    Значения в секундах раскладываются по корзинам с относительной
+    точностью HISTOGRAM_PRECISION от 1 мкс до любых больших значений;
+    память пропорциональна числу занятых корзин, а не числу замеров.
+    """
+
+    def __init__(self, precision=HISTOGRAM_PRECISION):
+        self.log_base = math.log1p(precision)
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Добавление замера."""
+        microseconds = max(seconds * 1e6, 1.0)
+        self.buckets[int(math.log(microseconds) / self.log_base)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Значение процентиля (верхняя граница корзины), с."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(math.exp((index + 1) * self.log_base) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        """Сводка гистограммы для JSON."""
+        summary = {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+        }
+        for percent in PERCENTILES:
+            summary[f"p{percent}"] = self.percentile(percent)
+        return summary
+
+
+class Metrics:
+    """Метрики опроса: гистограммы задержек, счётчики и показатели.
+
+    Гистограммы ведутся по коду функции ("FC03") и по блоку адресов
+    ("FC03 0-63") - только для блоков плана опроса, отмеченных track_block(),
+    чтобы произвольные диапазоны (запросы панелей через шлюз) не создавали
+    новых гистограмм без ограничения. Методы потокобезопасны: метрики пишет поток опроса,
+    а читает GUI или HTTP сервер.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.histograms = defaultdict(LatencyHistogram)
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.blocks = set()
+
+    def track_block(self, function_code, address, count):
+        """Отметка блока плана опроса: для него ведётся отдельная гистограмма."""
+        with self.lock:
+            self.blocks.add((function_code, address, count))
+
+    def observe_request(self, function_code, address, count, seconds, error):
+        """Учёт запроса: задержка, код функции, блок адресов и ошибка."""
+        with self.lock:
+            self.histograms[f"FC{function_code:02d}"].record(seconds)
+            if (function_code, address, count) in self.blocks:
+                self.histograms[f"FC{function_code:02d} {address}-{address + count - 1}"].record(seconds)
+            self.counters["requests"] += 1
+            if error == MB_TIMEOUT_ERR:
+                self.counters["timeouts"] += 1
+            elif error == MB_EXCEPT_ERR:
+                self.counters["exceptions"] += 1
+            elif error != MB_NO_ERR:
+                self.counters["errors"] += 1
+
+    def increment(self, name, value=1):
+        """Увеличение счётчика."""
+        with self.lock:
+            self.counters[name] += value
+
+    def observe_cycle(self, seconds):
+        """Учёт длительности цикла опроса."""
+        with self.lock:
+            self.histograms["cycle"].record(seconds)
+            self.gauges["cycle_duration"] = seconds
+
+    def set_gauge(self, name, value):
+        """Установка показателя."""
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Снимок всех метрик в виде словаря для JSON."""
+        with self.lock:
+            return {
+                "uptime": time.time() - self.started,
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def to_json(self):
+        """Снимок метрик в JSON."""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def dump(self, path):
+        """Сохранение снимка метрик в JSON файл."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+class InstrumentedClient:
+    """Обёртка pyModbusTCP клиента, учитывающая каждый запрос в метриках.
+
+    Остальные атрибуты (open, close, is_open, last_error...) передаются
+    исходному клиенту, поэтому обёртку можно использовать вместо него в
+    помощниках read_registers/write_registers/read_flag/write_flag.
+    """
+
+    def __init__(self, client, metrics):
+        self.client = client
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _timed(self, function_code, address, count, method, *args):
+        start = time.perf_counter()
+        response = method(*args)
+        self.metrics.observe_request(function_code, address, count, time.perf_counter() - start,
+                                     self.client.last_error)
+        return response
+
+    def read_holding_registers(self, address, count=1):
+        return self._timed(mbap.READ_HOLDING_REGISTERS, address, count, self.client.read_holding_registers,
+                           address, count)
+
+    def read_coils(self, address, count=1):
+        return self._timed(mbap.READ_COILS, address, count, self.client.read_coils, address, count)
+
+    def write_multiple_registers(self, address, registers):
+        return self._timed(mbap.WRITE_MULTIPLE_REGISTERS, address, len(registers),
+                           self.client.write_multiple_registers, address, registers)
+
+    def write_single_coil(self, address, value):
+        return self._timed(mbap.WRITE_SINGLE_COIL, address, 1, self.client.write_single_coil, address, value)
@@ -0,0 +1,151 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from coil_bank import coil_bit
+from metrics import PERCENTILES
+
+logger = logging.getLogger(__name__)
+
+# Тип содержимого текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Счётчики метрик опроса и их описания
+COUNTERS = {
+    "requests": "Запросов Modbus",
+    "timeouts": "Запросов без ответа (тайм-аут)",
+    "exceptions": "Ответов с исключением Modbus",
+    "errors": "Прочих ошибок запросов (соединение, формат ответа)",
+    "reconnects": "Переподключений к устройству",
+    "gateway_reads": "Чтений шлюза по запросу панелей",
+    "gateway_coalesced": "Запросов панелей, присоединённых к выполняемому чтению шлюза",
+}
+
+
+def escape_label(value):
+    """Экранирование значения метки Prometheus."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**values):
+    """Строка меток Prometheus: {имя="значение",...}."""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in values.items()) + "}"
+
+
+def metric(lines, name, kind, help_text, samples):
+    """Добавление метрики с описанием и типом; samples - пары (метки, значение)."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for sample_labels, value in samples:
+        lines.append(f"{name}{sample_labels} {value!r}")
+
+
+def summary_samples(summaries):
+    """Отсчёты метрики-сводки по сводкам гистограмм: квантили, _sum и _count."""
+    quantiles, sums, counts = [], [], []
+    for summary, sample_labels in summaries:
+        for percent in PERCENTILES:
+            quantiles.append((labels(**sample_labels, quantile=percent / 100), summary[f"p{percent}"]))
+        sums.append((labels(**sample_labels), summary["sum"]))
+        counts.append((labels(**sample_labels), summary["count"]))
+    return quantiles, sums, counts
+
+
+def render_metrics(register_map, values, coil_mask, link, snapshot):
+    """Метрики в текстовом формате Prometheus по последнему состоянию опроса.
+
+    values, coil_mask и link - результат Poller.state(), snapshot - снимок
+    Metrics.snapshot(); теги без прочитанного значения пропускаются.
+    """
+    lines = []
+    metric(lines, "modbus_tag_value", "gauge", "Значение тега карты регистров", [
+        (labels(name=tag.name, address=tag.address, label=tag.label), values[tag.name])
+        for tag in register_map.register_tags if tag.name in values
+    ])
+    metric(lines, "modbus_coil_state", "gauge", "Состояние катушки карты регистров", [
+        (labels(name=tag.name, address=tag.address, label=tag.label), int(coil_bit(coil_mask, tag.address)))
+        for tag in register_map.coil_tags
+    ])
+    metric(lines, "modbus_link_up", "gauge", "Есть ли связь с устройством", [("", int(bool(link)))])
+
+    counters = snapshot["counters"]
+    for name, help_text in COUNTERS.items():
+        metric(lines, f"modbus_{name}_total", "counter", help_text, [("", counters.get(name, 0))])
+
+    gauges = snapshot["gauges"]
+    metric(lines, "modbus_cycle_duration_seconds", "gauge", "Длительность последнего цикла опроса",
+           [("", gauges.get("cycle_duration", 0.0))])
+    metric(lines, "modbus_last_poll_timestamp_seconds", "gauge", "Время последнего цикла опроса (Unix)",
+           [("", gauges.get("last_poll", 0.0))])
+    metric(lines, "modbus_uptime_seconds", "gauge", "Время работы потока опроса", [("", snapshot["uptime"])])
+
+    requests, blocks = [], []
+    for name, summary in snapshot["histograms"].items():
+        if name == "cycle":
+            continue
+        function, _, block = name.partition(" ")
+        if block:
+            blocks.append((summary, dict(function=function, block=block)))
+        else:
+            requests.append((summary, dict(function=function)))
+    for name, help_text, summaries in (
+            ("modbus_request_duration_seconds", "Задержка запросов по коду функции", requests),
+            ("modbus_block_duration_seconds", "Задержка запросов по блоку адресов", blocks)):
+        quantiles, sums, counts = summary_samples(summaries)
+        metric(lines, name, "summary", help_text, quantiles)
+        lines.extend(f"{name}_sum{sample_labels} {value!r}" for sample_labels, value in sums)
+        lines.extend(f"{name}_count{sample_labels} {value!r}" for sample_labels, value in counts)
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP сервер метрик опроса в формате Prometheus (GET /metrics).
+
+    Ответ строится из состояния в памяти потока опроса и метрик транспорта,
+    поэтому запросы сборщиков не создают обращений к контроллеру.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, poller, register_map, host="127.0.0.1", port=9102):
+        super().__init__((host, port), MetricsHandler)
+        self.poller = poller
+        self.register_map = register_map
+        self._thread = threading.Thread(target=self.serve_forever, name="metrics-server", daemon=True)
+
+    def render(self):
+        values, coil_mask, link = self.poller.state()
+        return render_metrics(self.register_map, values, coil_mask, link, self.poller.metrics.snapshot())
+
+    def start(self):
+        """Запуск сервера в фоновом потоке."""
+        self._thread.start()
+        logger.info(f"Метрики опроса доступны на http://{self.server_address[0]}:{self.server_address[1]}/metrics")
+
+    def stop(self):
+        """Остановка сервера."""
+        self.shutdown()
+        self.server_close()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов метрик."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        try:
+            body = self.server.render().encode("utf-8")
+        except Exception as e:
+            logger.error(f"Ошибка при формировании метрик: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Запрос метрик {self.address_string()}: {format % args}")
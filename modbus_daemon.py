@@ -0,0 +1,59 @@
+import argparse
+import logging
+import signal
+import threading
+
+from pyModbusTCP.client import ModbusClient
+
+from metrics_server import MetricsServer
+from poller import Poller
+from register_map import DEFAULT_MAP_PATH, load_register_map
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Опрос контроллера без GUI: поток опроса, архив и метрики")
+    parser.add_argument("--map", default=DEFAULT_MAP_PATH, help="файл карты регистров")
+    parser.add_argument("--host", help="адрес устройства вместо указанного в карте регистров")
+    parser.add_argument("--port", type=int, help="порт устройства вместо указанного в карте регистров")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    register_map = load_register_map(args.map)
+    device = dict(register_map.device)
+    if args.host:
+        device["host"] = args.host
+    if args.port:
+        device["port"] = args.port
+
+    # Та же конфигурация клиента, что и у панели; подключением управляет поток опроса
+    client = ModbusClient(**device, auto_open=False)
+    poller = Poller(client, register_map, publish=False)
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    poller.start()
+    metrics_server = None
+    if register_map.metrics:
+        try:
+            metrics_server = MetricsServer(poller, register_map, **register_map.metrics)
+            metrics_server.start()
+        except OSError as e:
+            logger.error(f"Не удалось запустить сервер метрик: {e}")
+    logger.info(f"Опрос {device['host']}:{device['port']} запущен.")
+
+    stop_event.wait()
+
+    # Остановка сервера метрик, потока опроса, запись архива и закрытие соединения
+    if metrics_server is not None:
+        metrics_server.stop()
+    poller.stop()
+    logger.info("Соединение закрыто.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+
+def float32_to_registers(value):
+    """Преобразование float32 в два 16-битных регистра."""
+    packed = struct.pack('>f', value)
+    return struct.unpack('>HH', packed)
+
+
+def registers_to_float32(registers):
+    """Преобразование двух 16-битных регистров в float32."""
+    packed = struct.pack('>HH', *registers)
+    return struct.unpack('>f', packed)[0]
+
+
+# Помощники не открывают соединение: им управляет ConnectionManager,
+# вызывающий код проверяет connection.available() перед запросом.
+def read_registers(client, address, count):
+    """Чтение значения регистров по указанному адресу."""
+    response = client.read_holding_registers(address, count)
+    if response:
+        return response
+    logger.error(f"Ошибка чтения регистров по адресу {address}")
+    return None
+
+
+def write_registers(client, address, value):
+    """Запись значения в регистры по указанному адресу."""
+    registers = float32_to_registers(value)
+    success = client.write_multiple_registers(address, registers)
+    if not success:
+        logger.error(f"Ошибка записи в регистры по адресу {address}")
+    else:
+        logger.debug(f"Успешная запись в регистры по адресу {address} со значением {value}")
+    return success
+
+
+def read_flag(client, address):
+    """Чтение значения флага (катушки) по указанному адресу."""
+    response = client.read_coils(address, 1)
+    if response:
+        return response[0]
+    logger.error(f"Ошибка чтения флага по адресу {address}")
+    return None
+
+
+def write_flag(client, address, value):
+    """Запись значения флага (катушки) по указанному адресу."""
+    logger.debug(f"Попытка записи флага по адресу {address} со значением {value}")
+    success = client.write_single_coil(address, value)
+    if not success:
+        logger.error(f"Ошибка записи флага по адресу {address}")
+    else:
+        logger.debug(f"Успешная запись флага по адресу {address}")
+    return success
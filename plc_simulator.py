@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import logging
+import random
+import struct
+import threading
+
+import numpy as np
+
+import mbap
+from modbus_helpers import float32_to_registers, registers_to_float32
+from register_codec import decode_float32, encode_float32
+from register_map import load_register_map
+from thermal_model import HeatingModel, OUTPUT_REGISTERS
+
+logger = logging.getLogger(__name__)
+
+# Начальные значения регистров float32 контроллера отопления
+DEFAULT_VALUES = {
+    0: 10.0,     # ВРЕМЯ ЦИКЛА (контур 1)
+    2: 120.0,    # ВРЕМЯ ПОЛНОГО ХОДА
+    4: 1.0,      # КОЭФФИЦИЕНТ П
+    6: 0.001,    # КОЭФФИЦИЕНТ И
+    8: 0.0,      # КОЭФФИЦИЕНТ Д
+    10: 0.5,     # ЗОНА НЕЧУВСТВИТЕЛЬНОСТИ
+    12: 45.0,    # Текущая температура
+    14: 50.0,    # Требуемая температура
+    16: -5.0,    # Температура на улице
+    18: -20.0,   # T_X1
+    20: 70.0,    # T_Y1
+    22: 10.0,    # T_X2
+    24: 40.0,    # T_Y2
+    26: -20.0,   # X1 (контур 2)
+    28: 45.0,    # Y1
+    30: 10.0,    # X2
+    32: 30.0,    # Y2
+    34: 35.0,    # Требуемая температура (контур 2)
+    36: 33.0,    # Текущая температура (контур 2)
+    38: 10.0,    # ВРЕМЯ ЦИКЛА (контур 2)
+    40: 120.0,   # ВРЕМЯ ПОЛНОГО ХОДА
+    42: 1.0,     # КОЭФФИЦИЕНТ П
+    44: 0.001,   # КОЭФФИЦИЕНТ И
+    46: 0.0,     # КОЭФФИЦИЕНТ Д
+    48: 0.5,     # ЗОНА НЕЧУВСТВИТЕЛЬНОСТИ
+    50: 40.0,    # ТЕМП ВКЛ НАГРЕВА ГВС
+    52: 48.0,    # ТЕМП ВЫКЛ НАГРЕВА ГВС
+    54: 44.0,    # ТЕМПЕРАТУРА ГВС
+    56: 21.0,    # ДАТЧИК ТЕМПЕРАТУРЫ НА ДОМЕ №2
+    58: 15.0,    # ДАТЧИК ТЕМП НА КОТЕЛЬНОЙ ОХРАНЫ
+    60: 45.0,    # НАРУЖНЫЙ ДАТЧИК ПОДАЧИ РАДИАТОРОВ
+    62: 33.0,    # НАРУЖНЫЙ ДАТЧИК ПОДАЧИ ТЕПЛОГО ПОЛА
+}
+
+# Начальные состояния катушек: оба контура и ГВС в автоматическом режиме
+DEFAULT_COILS = (0, 5, 11)
+
+
+class PlcSimulator:
+    """Имитатор контроллера отопления: Modbus TCP сервер с картой панели.
+
+    Поддерживает FC01, FC03, FC05 и FC16. Для каждого запроса можно задать
+    задержку ответа latency (с), случайный разброс jitter (с) и долю
+    запросов drop_rate, на которые ответ не отправляется. Счётчики
+    requests, dropped, bytes_received и bytes_sent ведутся для бенчмарков.
+
+    Образ хранится построчно для houses домов: дом N отвечает на
+    идентификатор устройства N + 1 (идентификаторы 0 и 255 - дом 0).
+    Если задана тепловая модель model, она продвигается на step секунд
+    модельного времени каждые step / speed секунд реального времени.
+    """
+
+    def __init__(self, register_count=64, coil_count=19, latency=0.0, jitter=0.0, drop_rate=0.0, houses=1,
+                 model=None, step=1.0, speed=1.0, seed=None):
+        self.registers = np.zeros((houses, register_count), dtype=np.uint16)
+        self.coils = np.zeros((houses, coil_count), dtype=bool)
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.houses = houses
+        self.model = model
+        self.step = step
+        self.speed = speed
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.dropped = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self._server = None
+        self._writers = set()
+        self._loop = None
+        self._thread = None
+        self._model_task = None
+        self.port = None
+        for address, value in DEFAULT_VALUES.items():
+            if address + 1 < register_count:
+                self.registers[:, address:address + 2] = float32_to_registers(value)
+        for address in DEFAULT_COILS:
+            if address < coil_count:
+                self.coils[:, address] = True
+
+    @classmethod
+    def from_register_map(cls, register_map, **kwargs):
+        """Имитатор с размерами образа из карты регистров."""
+        register_count = max((tag.address + tag.width for tag in register_map.register_tags), default=0)
+        return cls(register_count=register_count, coil_count=register_map.coil_count, **kwargs)
+
+    def get_float(self, address, house=0):
+        """Значение float32 по адресу регистра."""
+        return registers_to_float32(self.registers[house, address:address + 2].tolist())
+
+    def set_float(self, address, value, house=0):
+        """Запись значения float32 по адресу регистра."""
+        with self.lock:
+            self.registers[house, address:address + 2] = float32_to_registers(value)
+
+    def step_model(self, dt):
+        """Шаг тепловой модели: уставки из образа, измерения обратно в образ."""
+        with self.lock:
+            words = self.registers[:, :self.registers.shape[1] // 2 * 2]
+            values = decode_float32(words).astype(np.float64)
+            self.model.step(values, self.coils, dt)
+            encoded = encode_float32(values)
+            for address in OUTPUT_REGISTERS:
+                self.registers[:, address:address + 2] = encoded[:, address:address + 2]
+
+    async def run_model(self):
+        """Периодический шаг тепловой модели в цикле событий сервера."""
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            self.step_model(self.step)
+            next_time += self.step / self.speed
+            await asyncio.sleep(max(0.0, next_time - loop.time()))
+
+    def handle(self, pdu, unit_id=1):
+        """Обработка PDU запроса и формирование PDU ответа."""
+        function_code = pdu[0]
+        if unit_id in (0, 255):
+            house = 0
+        elif unit_id <= self.houses:
+            house = unit_id - 1
+        else:
+            return mbap.exception_pdu(function_code, mbap.GATEWAY_TARGET_FAILED)
+        registers = self.registers[house]
+        coils = self.coils[house]
+        try:
+            if function_code == mbap.READ_HOLDING_REGISTERS:
+                address, count = struct.unpack_from('>HH', pdu, 1)
+                if not 1 <= count <= 125:
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+                if address + count > len(registers):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+                with self.lock:
+                    return mbap.registers_response(registers[address:address + count].tolist())
+            if function_code == mbap.READ_COILS:
+                address, count = struct.unpack_from('>HH', pdu, 1)
+                if not 1 <= count <= 2000:
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+                if address + count > len(coils):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+                with self.lock:
+                    return mbap.coils_response(coils[address:address + count].tolist())
+            if function_code == mbap.WRITE_SINGLE_COIL:
+                address, value = struct.unpack_from('>HH', pdu, 1)
+                if value not in (0x0000, 0xFF00):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+                if address >= len(coils):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+                with self.lock:
+                    coils[address] = value == 0xFF00
+                return pdu[:5]
+            if function_code == mbap.WRITE_MULTIPLE_REGISTERS:
+                address, count, byte_count = struct.unpack_from('>HHB', pdu, 1)
+                if not 1 <= count <= 123 or byte_count != count * 2:
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+                if address + count > len(registers):
+                    return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_ADDRESS)
+                with self.lock:
+                    registers[address:address + count] = struct.unpack_from(f'>{count}H', pdu, 6)
+                return pdu[:5]
+        except struct.error:
+            return mbap.exception_pdu(function_code, mbap.ILLEGAL_DATA_VALUE)
+        return mbap.exception_pdu(function_code, mbap.ILLEGAL_FUNCTION)
+
+    async def respond(self, writer, transaction_id, unit_id, pdu):
+        """Ответ на запрос с имитацией задержки и потерь канала."""
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.drop_rate:
+            self.dropped += 1
+            return
+        adu = mbap.build_adu(transaction_id, unit_id, self.handle(pdu, unit_id))
+        if not writer.is_closing():
+            writer.write(adu)
+            self.bytes_sent += len(adu)
+
+    async def serve_client(self, reader, writer):
+        """Обслуживание одного TCP соединения; запросы обрабатываются конвейерно."""
+        tasks = set()
+        self._writers.add(writer)
+        try:
+            while True:
+                transaction_id, unit_id, pdu = await mbap.read_adu(reader)
+                self.requests += 1
+                self.bytes_received += mbap.MBAP_HEADER.size + len(pdu)
+                task = asyncio.create_task(self.respond(writer, transaction_id, unit_id, pdu))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._writers.discard(writer)
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=502):
+        """Запуск сервера в текущем цикле событий."""
+        self._server = await asyncio.start_server(self.serve_client, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.model is not None:
+            self._model_task = asyncio.create_task(self.run_model())
+        logger.info(f"Имитатор контроллера слушает {host}:{self.port}")
+        return self._server
+
+    def start(self, host="127.0.0.1", port=502):
+        """Запуск сервера в фоновом потоке со своим циклом событий."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.serve(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="plc-simulator", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop(self):
+        """Остановка сервера, запущенного через start()."""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            if self._model_task is not None:
+                self._model_task.cancel()
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Имитатор контроллера отопления (Modbus TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, с")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="доля запросов без ответа")
+    parser.add_argument("--physics", action="store_true", help="включить тепловую модель")
+    parser.add_argument("--houses", type=int, default=1, help="количество домов (идентификаторы устройств 1..N)")
+    parser.add_argument("--step", type=float, default=1.0, help="шаг модели, с модельного времени")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение модельного времени")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    model = HeatingModel(args.houses) if args.physics else None
+    simulator = PlcSimulator.from_register_map(load_register_map(), latency=args.latency, jitter=args.jitter,
+                                               drop_rate=args.drop_rate, houses=args.houses, model=model,
+                                               step=args.step, speed=args.speed)
+
+    async def run():
+        server = await simulator.serve(args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import math
+
+
+class PollScheduler:
+    """Расписание опроса тегов по классам опроса.
+
+    Каждый класс имеет свой период в секундах; класс с периодом None
+    читается один раз при запуске и затем только после записи в его теги.
+    Теги, переданные в request(), читаются в ближайшем цикле вне очереди.
+    """
+
+    def __init__(self, tags, poll_classes):
+        self.periods = dict(poll_classes)
+        self.class_tags = {name: [] for name in self.periods}
+        for tag in tags:
+            self.class_tags[tag.poll].append(tag)
+        self._next = {name: 0.0 for name, class_tags in self.class_tags.items() if class_tags}
+        self._requested = {}
+
+    def request(self, tags):
+        """Внеочередное чтение тегов (например, после записи)."""
+        for tag in tags:
+            self._requested[tag.name] = tag
+
+    def due(self, now):
+        """Теги, которые пора прочитать, с переносом следующего срока классов."""
+        due = dict(self._requested)
+        self._requested.clear()
+        for name, next_time in self._next.items():
+            if now >= next_time:
+                period = self.periods[name]
+                self._next[name] = math.inf if period is None else now + period
+                due.update((tag.name, tag) for tag in self.class_tags[name])
+        return list(due.values())
+
+    def next_time(self):
+        """Ближайший момент, когда какой-либо тег станет пора читать."""
+        if self._requested:
+            return 0.0
+        return min(self._next.values(), default=math.inf)
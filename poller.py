@@ -0,0 +1,231 @@
+import concurrent.futures
+import logging
+import math
+import queue
+import threading
+import time
+
+import mbap
+from modbus_helpers import write_registers, write_flag
+from register_image import read_tags
+from coil_bank import read_coil_bank
+from poll_scheduler import PollScheduler
+from staged_write import WriteBackCache
+from connection import ConnectionManager
+from metrics import Metrics, InstrumentedClient
+from historian import Historian, now_ms
+from last_state import save_state
+
+logger = logging.getLogger(__name__)
+
+# Период сохранения последнего прочитанного состояния, с
+STATE_SAVE_INTERVAL = 10.0
+
+
+class Poller(threading.Thread):
+    """Фоновый опрос Modbus устройства.
+
+    Поток единолично владеет клиентом: читает теги карты регистров по
+    расписанию их классов опроса, выполняет команды записи из очереди
+    commands и публикует декодированные снимки в очередь snapshots:
+    ("coils", битовая маска всех катушек),
+    ("registers", {имя тега: значение} прочитанных в цикле тегов) и
+    ("link", есть ли связь) при смене состояния соединения.
+    Все запросы клиента учитываются в метриках metrics, прочитанные
+    значения регистров записываются в оперативный архив historian, а
+    последние значения доступны другим потокам через state().
+    Клиент должен быть создан с auto_open=False: подключением управляет
+    ConnectionManager, а без связи опрос и запись завершаются сразу.
+    Без GUI (publish=False) снимки не публикуются: очередь snapshots
+    некому разбирать. Если в карте задан state_file, последнее прочитанное
+    состояние периодически сохраняется в него для отображения при запуске.
+    """
+
+    def __init__(self, client, register_map, publish=True):
+        super().__init__(name="modbus-poller", daemon=True)
+        self.metrics = Metrics()
+        self.client = InstrumentedClient(client, self.metrics)
+        self.register_map = register_map
+        self.scheduler = PollScheduler(register_map.tags, register_map.poll_classes)
+        self.coil_mask = 0
+        self.values = {}
+        self.state_lock = threading.Lock()
+        self.reads = {}
+        self.historian = Historian.from_register_map(register_map)
+        self._state_saved = time.monotonic()
+        self.cache = WriteBackCache(register_map.write_codecs())
+        self.connection = ConnectionManager(client, on_connect=self.connected)
+        self.link = None
+        self.commands = queue.Queue()
+        self.snapshots = queue.Queue() if publish else None
+        self._stop_event = threading.Event()
+
+    def send(self, *command):
+        """Постановка команды в очередь потока опроса."""
+        self.commands.put(command)
+
+    def forward(self, method, *args):
+        """Вызов метода клиента в потоке опроса: Future с ответом устройства (None без связи)."""
+        future = concurrent.futures.Future()
+        self.send("forward", future, method, args)
+        return future
+
+    def connected(self):
+        """Учёт переподключения и полное перечитывание после него."""
+        if self.connection.reconnects > 1:
+            self.metrics.increment("reconnects")
+        self.send("refresh")
+
+    def stop(self):
+        """Остановка потока опроса и закрытие соединения."""
+        self._stop_event.set()
+        self.commands.put(None)
+        if self.is_alive():
+            self.join()
+        self.connection.stop()
+        self.historian.close()
+        self.save_state()
+
+    def run(self):
+        self.connection.start()
+        while not self._stop_event.is_set():
+            try:
+                due = self.scheduler.due(time.monotonic())
+                if due:
+                    self.poll(due)
+            except Exception as e:
+                logger.error(f"Ошибка опроса устройства: {e}")
+
+            timeout = self.scheduler.next_time() - time.monotonic()
+            try:
+                command = self.commands.get(timeout=None if math.isinf(timeout) else max(timeout, 0))
+            except queue.Empty:
+                continue
+            # Выполнение всех накопившихся команд перед следующим опросом
+            while command is not None:
+                self.execute(command)
+                try:
+                    command = self.commands.get_nowait()
+                except queue.Empty:
+                    command = None
+
+    def poll(self, tags):
+        """Чтение тегов, которые пора опросить, и публикация снимков."""
+        if not self.connection.available():
+            self.set_link(False)
+            return
+        start = time.perf_counter()
+        coil_tags = [tag for tag in tags if tag.type == "coil"]
+        register_tags = [tag for tag in tags if tag.type != "coil"]
+        if coil_tags:
+            self.poll_coils(coil_tags)
+        if register_tags:
+            self.poll_registers(register_tags)
+        self.metrics.observe_cycle(time.perf_counter() - start)
+        self.metrics.set_gauge("last_poll", time.time())
+        self.set_link(self.connection.available())
+        if time.monotonic() - self._state_saved >= STATE_SAVE_INTERVAL:
+            self.save_state()
+
+    def save_state(self):
+        """Сохранение последнего прочитанного состояния в state_file карты."""
+        self._state_saved = time.monotonic()
+        values, coil_mask, _ = self.state()
+        if self.register_map.state_file is None or not values:
+            return
+        try:
+            save_state(self.register_map.state_file, values, coil_mask, now_ms())
+        except OSError as e:
+            logger.error(f"Ошибка сохранения состояния в {self.register_map.state_file}: {e}")
+
+    def publish(self, kind, data):
+        """Публикация снимка для GUI."""
+        if self.snapshots is not None:
+            self.snapshots.put((kind, data))
+
+    def state(self):
+        """Последнее прочитанное состояние: (значения {имя тега: значение}, маска катушек, связь)."""
+        with self.state_lock:
+            return dict(self.values), self.coil_mask, self.link
+
+    def set_link(self, link):
+        """Публикация состояния связи при его изменении."""
+        if link != self.link:
+            with self.state_lock:
+                self.link = link
+            self.publish("link", link)
+
+    def poll_coils(self, tags):
+        """Чтение катушек одним запросом и публикация полного снимка."""
+        start = min(tag.address for tag in tags)
+        count = max(tag.address for tag in tags) - start + 1
+        self.metrics.track_block(mbap.READ_COILS, start, count)
+        mask = read_coil_bank(self.client, start, count)
+        if mask is not None:
+            bank = ((1 << count) - 1) << start
+            with self.state_lock:
+                self.coil_mask = self.coil_mask & ~bank | mask
+            self.publish("coils", self.coil_mask)
+
+    def poll_registers(self, tags):
+        """Чтение регистров по плану и публикация декодированных значений."""
+        key = tuple(tag.name for tag in tags)
+        if key not in self.reads:
+            # План чтения и декодеры блоков компилируются один раз на набор тегов
+            self.reads[key] = self.register_map.compile_reads(tags)
+            for decoder in self.reads[key]:
+                self.metrics.track_block(mbap.READ_HOLDING_REGISTERS, decoder.start, decoder.count)
+        values = read_tags(self.client, self.reads[key])
+        self.historian.record(tags, values)
+        self.cache.update({tag.address: values[tag.name] for tag in tags
+                           if tag.name in values and tag.codec.writable})
+        with self.state_lock:
+            self.values.update(values)
+        self.publish("registers", values)
+
+    def forward_call(self, future, method, args):
+        """Выполнение вызова forward() и планирование чтения тегов после записи."""
+        if not self.connection.available():
+            future.set_result(None)
+            return
+        try:
+            response = getattr(self.client, method)(*args)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        future.set_result(response)
+        if method == "write_single_coil":
+            self.scheduler.request(self.tags_at(args[0], coil=True))
+        elif method == "write_multiple_registers":
+            for address in range(args[0], args[0] + len(args[1])):
+                self.scheduler.request(self.tags_at(address, coil=False))
+
+    def tags_at(self, address, coil):
+        """Теги карты по адресу катушки или регистра."""
+        return [tag for tag in self.register_map.tags if tag.address == address and (tag.type == "coil") == coil]
+
+    def execute(self, command):
+        """Выполнение команды записи и планирование повторного чтения."""
+        name, *args = command
+        try:
+            if name.startswith("write_") and not self.connection.available():
+                logger.error(f"Нет соединения с устройством Modbus, команда {name} отклонена")
+            elif name == "write_flag":
+                write_flag(self.client, *args)
+                self.scheduler.request(self.tags_at(args[0], coil=True))
+            elif name == "write_registers":
+                write_registers(self.client, *args)
+                self.scheduler.request(self.tags_at(args[0], coil=False))
+            elif name == "write_values":
+                values, = args
+                self.cache.commit(self.client, values)
+                for address in values:
+                    self.scheduler.request(self.tags_at(address, coil=False))
+            elif name == "forward":
+                self.forward_call(*args)
+            elif name == "refresh":
+                self.scheduler.request(self.register_map.tags)
+            else:
+                logger.error(f"Неизвестная команда потока опроса: {name}")
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении команды {name}: {e}")
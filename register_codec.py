@@ -0,0 +1,132 @@
+import functools
+import struct
+
+import numpy as np
+
+# Порядок слов и байт float32 контроллера: старшее слово первым, big-endian (ABCD)
+REGISTER_DTYPE = np.dtype('>u2')
+FLOAT32_DTYPE = np.dtype('>f4')
+
+
+def decode_float32(registers):
+    """Декодирование блока регистров в массив float32 одной операцией.
+
+    registers - последовательность или массив 16-битных регистров (по
+    последней оси чётное количество); пары регистров подряд образуют
+    значения float32. Для двумерного массива (N, 2K) результат (N, K).
+    """
+    return np.ascontiguousarray(registers, dtype=REGISTER_DTYPE).view(FLOAT32_DTYPE)
+
+
+def encode_float32(values):
+    """Кодирование массива значений в регистры: по два регистра на значение."""
+    return np.ascontiguousarray(values, dtype=FLOAT32_DTYPE).view(REGISTER_DTYPE)
+
+
+# Типы значений в регистрах: (символ struct, количество регистров)
+TYPES = {
+    "int16": ("h", 1),
+    "uint16": ("H", 1),
+    "int32": ("i", 2),
+    "uint32": ("I", 2),
+    "float32": ("f", 2),
+    "bits": ("H", 1),
+}
+
+# Порядок байт значения в регистрах (A - старший байт): (перестановка слов, порядок байт)
+ORDERS = {
+    "ABCD": (False, ">"),
+    "CDAB": (True, ">"),
+    "BADC": (True, "<"),
+    "DCBA": (False, "<"),
+}
+
+
+class Codec:
+    """Кодек значения тега: тип и порядок байт, скомпилированные в struct и dtype.
+
+    Для 32-битных типов при перестановке слов регистры значения меняются
+    местами, после чего байты читаются в порядке byteorder. Тип "bits" -
+    битовое поле шириной bits с младшего бита bit в одном регистре.
+    """
+
+    def __init__(self, type, order="ABCD", bit=0, bits=1):
+        if type not in TYPES:
+            raise ValueError(f"Неизвестный тип значения {type}")
+        if order not in ORDERS:
+            raise ValueError(f"Неизвестный порядок байт {order}")
+        char, self.width = TYPES[type]
+        word_swap, self.byteorder = ORDERS[order]
+        self.type = type
+        self.order = order
+        self.word_swap = word_swap and self.width == 2
+        self.bit = bit
+        self.mask = (1 << bits) - 1 if type == "bits" else None
+        self.dtype = np.dtype(self.byteorder + char)
+        self._value = struct.Struct(self.byteorder + char)
+        self._words = struct.Struct(">" + "H" * self.width)
+
+    @property
+    def writable(self):
+        """Можно ли записать значение целыми регистрами (битовые поля нельзя)."""
+        return self.mask is None
+
+    def decode(self, registers):
+        """Декодирование значения из регистров тега."""
+        if self.word_swap:
+            registers = registers[::-1]
+        value = self._value.unpack(self._words.pack(*registers))[0]
+        return value if self.mask is None else (value >> self.bit) & self.mask
+
+    def encode(self, value):
+        """Кодирование значения в регистры тега."""
+        if not self.writable:
+            raise ValueError("Битовое поле нельзя записать целым регистром")
+        if self.type != "float32":
+            value = int(value)
+        registers = self._words.unpack(self._value.pack(value))
+        return list(registers[::-1] if self.word_swap else registers)
+
+
+@functools.lru_cache(maxsize=None)
+def get_codec(type, order="ABCD", bit=0, bits=1):
+    """Кодек из реестра: один экземпляр на сочетание параметров."""
+    return Codec(type, order, bit, bits)
+
+
+class BlockDecoder:
+    """Скомпилированное декодирование тегов из блока регистров за один проход.
+
+    Для блока заранее строятся индекс перестановки слов и структурный dtype
+    с полем на каждый тег по его смещению, так что регистры разных типов и
+    порядков байт декодируются одним представлением буфера. entries - пары
+    (ключ, адрес, кодек); decode() возвращает {ключ: значение}.
+    """
+
+    def __init__(self, start, count, entries):
+        self.start = start
+        self.count = count
+        self.keys = [key for key, _, _ in entries]
+        self.order = np.arange(count)
+        names, formats, offsets, bit_fields = [], [], [], []
+        for index, (_, address, codec) in enumerate(entries):
+            offset = address - start
+            if offset < 0 or offset + codec.width > count:
+                raise ValueError(f"Адрес {address} вне блока регистров {start}-{start + count - 1}")
+            if codec.word_swap:
+                self.order[offset:offset + 2] = (offset + 1, offset)
+            names.append(f"f{index}")
+            formats.append(codec.dtype)
+            offsets.append(offset * 2)
+            if codec.mask is not None:
+                bit_fields.append((index, codec.bit, codec.mask))
+        self.dtype = np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": count * 2})
+        self.bit_fields = bit_fields
+
+    def decode(self, registers):
+        """Декодирование ответа на чтение блока: {ключ: значение}."""
+        words = np.asarray(registers, dtype=REGISTER_DTYPE)[self.order]
+        values = list(words.view(self.dtype)[0].tolist()) if self.keys else []
+        for index, bit, mask in self.bit_fields:
+            values[index] = (values[index] >> bit) & mask
+        return dict(zip(self.keys, values))
@@ -0,0 +1,79 @@
+import logging
+
+from register_codec import BlockDecoder
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество регистров в одном запросе FC03 (ограничение PDU Modbus)
+MAX_READ_REGISTERS = 125
+
+
+def plan_spans(spans, max_count=MAX_READ_REGISTERS, max_gap=None, skip=frozenset()):
+    """Составление плана чтения: список блоков (начало, количество) для FC03.
+
+    spans - пары (адрес, количество регистров) тегов. Соседние теги
+    объединяются в один запрос, пока блок не превышает max_count регистров.
+    Если задан max_gap, теги, между которыми больше max_gap непрочитанных
+    регистров, читаются отдельными запросами. Промежуток, в который попадает
+    адрес из skip (регистры тегов, которые сейчас читать не нужно), тоже
+    разделяет запросы.
+    """
+    plan = []
+    for address, width in sorted(set(spans)):
+        end = address + width
+        if plan:
+            start, count = plan[-1]
+            gap = address - (start + count)
+            if end - start <= max_count and (max_gap is None or gap <= max_gap) \
+                    and not any(skipped in skip for skipped in range(start + count, address)):
+                plan[-1] = (start, max(count, end - start))
+                continue
+        plan.append((address, width))
+    return plan
+
+
+def compile_reads(tags, max_count=MAX_READ_REGISTERS, max_gap=None, skip=frozenset()):
+    """Скомпилированный план чтения тегов: декодер на каждый блок плана."""
+    decoders = []
+    for start, count in plan_spans(((tag.address, tag.width) for tag in tags), max_count, max_gap, skip):
+        entries = [(tag.name, tag.address, tag.codec) for tag in tags
+                   if start <= tag.address and tag.address + tag.width <= start + count]
+        decoders.append(BlockDecoder(start, count, entries))
+    return decoders
+
+
+def read_image(client, plan):
+    """Чтение образа регистров по плану: словарь {адрес: значение регистра}."""
+    image = {}
+    for start, count in plan:
+        store_block(image, start, count, client.read_holding_registers(start, count))
+    return image
+
+
+def store_block(image, start, count, response):
+    """Помещение ответа на чтение блока в образ регистров."""
+    if response and len(response) == count:
+        image.update(zip(range(start, start + count), response))
+    else:
+        logger.error(f"Ошибка чтения блока регистров {start}-{start + count - 1}")
+
+
+def read_tags(client, decoders):
+    """Чтение тегов по скомпилированному плану: словарь {имя тега: значение}.
+
+    Каждый прочитанный блок декодируется целиком за один проход, теги
+    разных типов и порядков байт - одним представлением буфера NumPy.
+    """
+    values = {}
+    for decoder in decoders:
+        values.update(decode_block(decoder, client.read_holding_registers(decoder.start, decoder.count)))
+    return values
+
+
+def decode_block(decoder, response):
+    """Декодирование ответа на чтение блока; пустой словарь при ошибке чтения."""
+    if not response or len(response) != decoder.count:
+        logger.error(f"Ошибка чтения блока регистров {decoder.start}-{decoder.start + decoder.count - 1}")
+        return {}
+    return decoder.decode(response)
+
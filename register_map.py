@@ -0,0 +1,181 @@
+import json
+import os
+from dataclasses import dataclass, field, replace
+
+from register_codec import TYPES, ORDERS, get_codec
+from register_image import compile_reads, plan_spans
+
+# Карта регистров по умолчанию (рядом с модулем)
+DEFAULT_MAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "register_map.json")
+
+# Количество регистров, занимаемых значением каждого типа
+TYPE_WIDTHS = {"coil": 1, **{name: width for name, (_, width) in TYPES.items()}}
+
+# Порядок байт значений по умолчанию
+DEFAULT_BYTE_ORDER = "ABCD"
+
+# Виды виджетов панели
+WIDGET_KINDS = ("value", "button", "lamp")
+
+
+@dataclass(frozen=True)
+class Tag:
+    """Тег карты регистров: значение по одному адресу устройства."""
+    name: str
+    address: int
+    type: str
+    poll: str
+    range: tuple = None
+    group: str = None
+    widget: dict = None
+    codec: object = field(default=None, compare=False, repr=False)
+
+    @property
+    def width(self):
+        return TYPE_WIDTHS[self.type]
+
+    @property
+    def label(self):
+        """Подпись тега без завершающего двоеточия (для сообщений)."""
+        text = self.widget.get("text", self.name) if self.widget else self.name
+        return text.rstrip(":")
+
+    def in_range(self, value):
+        """Проверка значения на допустимый диапазон тега."""
+        return self.range is None or self.range[0] <= value <= self.range[1]
+
+
+@dataclass
+class RegisterMap:
+    """Скомпилированная карта регистров: план чтения и раскладка виджетов."""
+    device: dict
+    poll_classes: dict
+    frames: list
+    groups: list
+    tags: list
+    metrics: dict = None
+    historian: dict = None
+    trends: list = None
+    state_file: str = None
+    gateway: dict = None
+    register_tags: list = field(init=False)
+    coil_tags: list = field(init=False)
+    register_plan: list = field(init=False)
+    coil_count: int = field(init=False)
+    layout: dict = field(init=False)
+
+    def __post_init__(self):
+        self.register_tags = [tag for tag in self.tags if tag.type != "coil"]
+        self.coil_tags = [tag for tag in self.tags if tag.type == "coil"]
+        self.register_plan = plan_spans((tag.address, tag.width) for tag in self.register_tags)
+        self.coil_count = max((tag.address for tag in self.coil_tags), default=-1) + 1
+        self.layout = widget_layout(self.frames, self.tags)
+
+    def tag(self, name):
+        """Тег по имени."""
+        for tag in self.tags:
+            if tag.name == name:
+                return tag
+        raise KeyError(name)
+
+    def group_tags(self, group):
+        """Теги группы записи в порядке карты."""
+        return [tag for tag in self.tags if tag.group == group]
+
+    def compile_reads(self, tags):
+        """План чтения регистровых тегов tags без регистров остальных тегов карты.
+
+        Иначе блок быстрого класса, объединяя теги через промежуток, каждый
+        цикл перечитывал бы регистры медленного класса между ними.
+        """
+        names = {tag.name for tag in tags}
+        skip = {address for tag in self.register_tags if tag.name not in names
+                for address in range(tag.address, tag.address + tag.width)}
+        return compile_reads(tags, skip=skip)
+
+    def write_codecs(self):
+        """Кодеки записываемых тегов по адресу: {адрес: кодек}."""
+        return {tag.address: tag.codec for tag in self.register_tags if tag.codec.writable}
+
+
+def widget_layout(frames, tags):
+    """Раскладка виджетов: {имя рамки: теги в порядке строк}."""
+    layout = {frame["name"]: [] for frame in frames}
+    for tag in tags:
+        if tag.widget:
+            layout[tag.widget["frame"]].append(tag)
+    for frame_tags in layout.values():
+        frame_tags.sort(key=lambda tag: tag.widget["row"])
+    return layout
+
+
+def load_register_map(path=DEFAULT_MAP_PATH):
+    """Загрузка и проверка карты регистров из JSON файла.
+
+    Относительные пути архива и файла состояния отсчитываются от каталога
+    карты, а не от текущего каталога процесса.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+
+    frame_names = {frame["name"] for frame in data["frames"]}
+    group_names = {group["name"] for group in data.get("groups", [])}
+    poll_classes = data["poll_classes"]
+    byte_order = data.get("byte_order", DEFAULT_BYTE_ORDER)
+    tags = []
+    names = set()
+    for item in data["tags"]:
+        tag = Tag(
+            name=item["name"],
+            address=item["address"],
+            type=item["type"],
+            poll=item["poll"],
+            range=tuple(item["range"]) if "range" in item else None,
+            group=item.get("group"),
+            widget=item.get("widget"),
+        )
+        if tag.name in names:
+            raise ValueError(f"Повторное имя тега {tag.name}")
+        if tag.type not in TYPE_WIDTHS:
+            raise ValueError(f"Неизвестный тип {tag.type} у тега {tag.name}")
+        if tag.type != "coil":
+            order = item.get("order", byte_order)
+            if order not in ORDERS:
+                raise ValueError(f"Неизвестный порядок байт {order} у тега {tag.name}")
+            if tag.type == "bits" and not 0 <= item.get("bit", 0) < item.get("bit", 0) + item.get("bits", 1) <= 16:
+                raise ValueError(f"Некорректное битовое поле у тега {tag.name}")
+            tag = replace(tag, codec=get_codec(tag.type, order, item.get("bit", 0), item.get("bits", 1)))
+            if tag.group is not None and not tag.codec.writable:
+                raise ValueError(f"Битовое поле {tag.name} нельзя включить в группу записи")
+        if tag.poll not in poll_classes:
+            raise ValueError(f"Неизвестный класс опроса {tag.poll} у тега {tag.name}")
+        if tag.group is not None and tag.group not in group_names:
+            raise ValueError(f"Неизвестная группа записи {tag.group} у тега {tag.name}")
+        if tag.widget and (tag.widget["kind"] not in WIDGET_KINDS or tag.widget["frame"] not in frame_names):
+            raise ValueError(f"Некорректный виджет у тега {tag.name}")
+        names.add(tag.name)
+        tags.append(tag)
+
+    register_names = {tag.name for tag in tags if tag.type != "coil"}
+    for trend in data.get("trends", []):
+        unknown = [name for name in trend["tags"] if name not in register_names]
+        if unknown:
+            raise ValueError(f"Неизвестные регистровые теги {', '.join(unknown)} в тренде {trend['name']}")
+
+    historian = data.get("historian")
+    if historian is not None and "path" in historian:
+        historian = dict(historian, path=os.path.join(base, historian["path"]))
+
+    return RegisterMap(
+        device=data["device"],
+        poll_classes=poll_classes,
+        frames=data["frames"],
+        groups=data.get("groups", []),
+        tags=tags,
+        metrics=data.get("metrics"),
+        historian=historian,
+        trends=data.get("trends", []),
+        state_file=os.path.join(base, data["state_file"]) if data.get("state_file") else None,
+        gateway=data.get("gateway"),
+    )
@@ -0,0 +1,106 @@
+import logging
+
+from register_codec import BlockDecoder, encode_float32, get_codec
+from register_image import decode_block, plan_spans
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество регистров в одном запросе FC16 (ограничение PDU Modbus)
+MAX_WRITE_REGISTERS = 123
+
+
+def plan_writes(values, max_count=MAX_WRITE_REGISTERS, codecs=None):
+    """Составление плана записи: список блоков (начало, регистры) для FC16.
+
+    values - словарь {адрес: значение}. Значения по соседним адресам
+    объединяются в один непрерывный блок. Без codecs все значения - float32
+    ABCD и кодируются в регистры одной операцией; иначе каждое значение
+    кодируется кодеком тега из словаря {адрес: кодек}.
+    """
+    addresses = sorted(values)
+    if codecs is None:
+        encoded = encode_float32([values[address] for address in addresses]).reshape(-1, 2).tolist()
+    else:
+        encoded = [codecs[address].encode(values[address]) for address in addresses]
+    plan = []
+    for address, words in zip(addresses, encoded):
+        if plan:
+            start, registers = plan[-1]
+            if address == start + len(registers) and len(registers) + len(words) <= max_count:
+                registers.extend(words)
+                continue
+        plan.append((address, list(words)))
+    return plan
+
+
+def write_staged(client, values, codecs=None):
+    """Запись подготовленных значений наименьшим числом запросов FC16 (соединение проверяет вызывающий)."""
+    success = True
+    for start, registers in plan_writes(values, codecs=codecs):
+        if client.write_multiple_registers(start, registers):
+            logger.debug(f"Успешная запись блока регистров {start}-{start + len(registers) - 1}")
+        else:
+            logger.error(f"Ошибка записи блока регистров {start}-{start + len(registers) - 1}")
+            success = False
+    return success
+
+
+class WriteBackCache:
+    """Кэш обратной записи поверх последнего прочитанного образа.
+
+    Хранит последние известные значения регистров и при записи отправляет
+    только те подготовленные значения, которые отличаются от них
+    (сравнение по закодированным регистрам: float32 или кодеками codecs).
+    Значения опроса могут быть прочитаны минуты назад и изменены с тех пор
+    другой панелью или контроллером, поэтому перед сравнением блоки
+    записываемых адресов перечитываются; адреса, которые прочитать не
+    удалось, записываются без сравнения.
+    """
+
+    def __init__(self, codecs=None):
+        self.codecs = codecs
+        self.values = {}
+
+    def update(self, values):
+        """Обновление кэша прочитанными значениями {адрес: значение}."""
+        self.values.update(values)
+
+    def refresh(self, client, addresses):
+        """Перечитывание значений по адресам наименьшим числом запросов FC03."""
+        codecs = {address: self.codecs[address] if self.codecs is not None else get_codec("float32")
+                  for address in addresses}
+        for start, count in plan_spans((address, codec.width) for address, codec in codecs.items()):
+            block = [address for address in codecs if start <= address < start + count]
+            decoder = BlockDecoder(start, count, [(address, address, codecs[address]) for address in block])
+            values = decode_block(decoder, client.read_holding_registers(start, count))
+            for address in block:
+                if address in values:
+                    self.values[address] = values[address]
+                else:
+                    self.values.pop(address, None)
+
+    def dirty(self, staged):
+        """Подготовленные значения, отличающиеся от кэша."""
+        if self.codecs is not None:
+            return {
+                address: value for address, value in staged.items()
+                if address not in self.values
+                or self.codecs[address].encode(value) != self.codecs[address].encode(self.values[address])
+            }
+        known = [address for address in staged if address in self.values]
+        changed = encode_float32([staged[address] for address in known]) != \
+            encode_float32([self.values[address] for address in known])
+        unchanged = {address for address, differs in zip(known, changed.reshape(-1, 2).any(axis=1)) if not differs}
+        return {address: value for address, value in staged.items() if address not in unchanged}
+
+    def commit(self, client, staged):
+        """Запись только изменённых значений непрерывными блоками FC16."""
+        self.refresh(client, staged)
+        dirty = self.dirty(staged)
+        if not dirty:
+            logger.debug("Нет изменённых значений для записи")
+            return True
+        success = write_staged(client, dirty, self.codecs)
+        if success:
+            self.values.update(dirty)
+        return success
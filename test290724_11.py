@@ -1,702 +1,370 @@
 import tkinter as tk
 import logging
-import struct
+import queue
+import threading
 from pyModbusTCP.client import ModbusClient
+from coil_bank import coil_bit
+from metrics_server import MetricsServer
+from poller import Poller
+from register_map import load_register_map
+from historian import now_ms
+from last_state import load_state
+from trend_chart import TrendChart
+from widget_cache import WidgetCache
 
 # Настройка логирования
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Инициализация Modbus клиента
-client = ModbusClient(host='192.168.1.126', port=502, auto_open=True, timeout=10)
+# Загрузка карты регистров: адреса, типы, диапазоны и раскладка виджетов
+register_map = load_register_map()
 
+# Инициализация Modbus клиента (используется только потоком опроса, подключение в фоне)
+client = ModbusClient(**register_map.device, auto_open=False)
 
-def float32_to_registers(value):
-    """Преобразование float32 в два 16-битных регистра."""
-    packed = struct.pack('>f', value)
-    return struct.unpack('>HH', packed)
-
-
-def registers_to_float32(registers):
-    """Преобразование двух 16-битных регистров в float32."""
-    packed = struct.pack('>HH', *registers)
-    return struct.unpack('>f', packed)[0]
-
-
-def ensure_connection():
-    """Проверка и восстановление подключения к Modbus устройству."""
-    if not client.is_open:
-        if not client.open():
-            logger.error("Не удалось установить соединение с устройством Modbus.")
-            return False
-        else:
-            logger.info("Соединение с устройством Modbus установлено.")
-    return True
-
-
-def read_registers(client, address, count):
-    """Чтение значения регистров по указанному адресу."""
-    if ensure_connection():
-        response = client.read_holding_registers(address, count)
-        if response:
-            return response
-        else:
-            logger.error(f"Ошибка чтения регистров по адресу {address}")
-    return None
 
+# Инициализация флагов
+flags = [False] * register_map.coil_count
 
-def write_registers(client, address, value):
-    """Запись значения в регистры по указанному адресу."""
-    if ensure_connection():
-        registers = float32_to_registers(value)
-        success = client.write_multiple_registers(address, registers)
-        if not success:
-            logger.error(f"Ошибка записи в регистры по адресу {address}")
-        else:
-            logger.debug(f"Успешная запись в регистры по адресу {address} со значением {value}")
+# Катушки показаны по сохранённому состоянию, живой снимок ещё не получен
+coils_stale = False
 
+# Виджеты, созданные по карте регистров
+frames = {}
+entries = {}
+value_labels = []
+coil_buttons = []
+coil_lamps = []
 
-def read_flag(client, address):
-    """Чтение значения флага (катушки) по указанному адресу."""
-    if ensure_connection():
-        response = client.read_coils(address, 1)
-        if response:
-            return response[0]
-        else:
-            logger.error(f"Ошибка чтения флага по адресу {address}")
-    return None
+# Файл для сохранения снимка метрик опроса
+METRICS_PATH = "modbus_metrics.json"
 
+# Интервалы графика трендов, с
+TREND_WINDOWS = {"1 ч": 3600, "8 ч": 8 * 3600, "24 ч": 24 * 3600}
 
-def write_flag(client, address, value):
-    """Запись значения флага (катушки) по указанному адресу."""
-    if ensure_connection():
-        logger.debug(f"Попытка записи флага по адресу {address} со значением {value}")
-        success = client.write_single_coil(address, value)
-        if not success:
-            logger.error(f"Ошибка записи флага по адресу {address}")
-        else:
-            logger.debug(f"Успешная запись флага по адресу {address}")
+# Цвета рядов графика трендов
+TREND_COLORS = ("red", "blue", "green", "orange")
 
+# Последние отображённые значения виджетов: Tk вызывается только при изменении
+widget_cache = WidgetCache()
 
-# Инициализация флагов
-flags = [False, False, False, False, False, False, False, False, False, False, False, False, False, False, False, False,
-         False, False, False]
+# Результаты запросов графика трендов из рабочего потока и состояние запроса
+trend_results = queue.Queue()
+trend_query = None
+trend_pending = False
 
 
 # Функция для обновления флагов
 def toggle_flag(flag_index):
     """Переключение состояния флага и обновление меток."""
     global flags
+    if coils_stale:
+        logger.error("Состояние катушек ещё не прочитано с устройства, переключение отклонено")
+        return
     flags[flag_index] = not flags[flag_index]
-    write_flag(client, flag_index, flags[flag_index])
+    poller.send("write_flag", flag_index, flags[flag_index])
     update_button_colors()
 
 
 # Функция для обновления меток
-def update_labels():
-    """Обновление меток и цветов кнопок в зависимости от состояния флагов."""
+def update_labels(mask):
+    """Обновление меток и цветов кнопок по снимку катушек."""
     try:
-        # Обновление состояния флагов ОТКРЫТИЕ и ЗАКРЫТИЕ
-        flags[3] = read_flag(client, 3)
-        flags[4] = read_flag(client, 4)
-        label_opening.config(bg="orange" if flags[3] else "grey")
-        label_closing.config(bg="orange" if flags[4] else "grey")
-
-        flags[8] = read_flag(client, 8)
-        flags[9] = read_flag(client, 9)
-        label_opening2.config(bg="orange" if flags[8] else "grey")
-        label_closing2.config(bg="orange" if flags[9] else "grey")
-
-        flags[10] = read_flag(client, 10)
-        label_boiler_relay.config(bg="orange" if flags[10] else "grey")
-
-        for i in range(12, 19):
-            flags[i] = read_flag(client, i)
-
-        label_correction_radiators_plus.config(bg="orange" if flags[12] else "grey")
-        label_correction_radiators_minus.config(bg="orange" if flags[13] else "grey")
-        label_correction_floor_plus.config(bg="orange" if flags[14] else "grey")
-        label_correction_floor_minus.config(bg="orange" if flags[15] else "grey")
-        label_sensor_selection.config(bg="orange" if flags[16] else "grey")
-        label_external_sensor_activation.config(bg="orange" if flags[17] else "grey")
-        label_external_sensor_record.config(bg="orange" if flags[18] else "grey")
+        for i in range(len(flags)):
+            flags[i] = coil_bit(mask, i)
 
-        update_button_colors()
+        for i, lamp in coil_lamps:
+            widget_cache.config(lamp, bg=coil_color(flags[i]))
 
-        root.after(1000, update_labels)  # Обновление каждые 1 секунду
+        update_button_colors()
     except Exception as e:
         logger.error(f"Ошибка при обновлении меток: {e}")
 
 
 def update_button_colors():
     """Обновление цветов кнопок в зависимости от их состояния."""
-    button_auto.config(bg="orange" if flags[0] else "grey")
-    button_open.config(bg="orange" if flags[1] else "grey")
-    button_close.config(bg="orange" if flags[2] else "grey")
+    for i, button in coil_buttons:
+        widget_cache.config(button, bg=coil_color(flags[i]), state="disabled" if coils_stale else "normal")
 
-    button_auto2.config(bg="orange" if flags[5] else "grey")
-    button_open2.config(bg="orange" if flags[6] else "grey")
-    button_close2.config(bg="orange" if flags[7] else "grey")
 
-    button_boiler_auto.config(bg="orange" if flags[11] else "grey")
+def coil_color(state):
+    """Цвет лампы и кнопки катушки; сохранённое состояние - бледными цветами."""
+    if coils_stale:
+        return "moccasin" if state else "gainsboro"
+    return "orange" if state else "grey"
 
 
-def update_register_values():
-    """Обновление значений регистров."""
+def set_coils_stale(stale):
+    """Отметка катушек как показанных по сохранённому состоянию до первого снимка катушек."""
+    global coils_stale
+    coils_stale = stale
+    for i, lamp in coil_lamps:
+        widget_cache.config(lamp, bg=coil_color(flags[i]))
+    update_button_colors()
+
+
+def update_register_values(values):
+    """Обновление значений регистров по снимку."""
     try:
         logger.debug("Обновление значений регистров")
 
-        def update_register_label(address, count, label):
-            registers = read_registers(client, address, count)
-            if registers:
-                value = registers_to_float32(registers)
-                label.config(text=f"{value:.1f}")
-
-        update_register_label(18, 2, label_tx1_value)
-        update_register_label(20, 2, label_ty1_value)
-        update_register_label(22, 2, label_tx2_value)
-        update_register_label(24, 2, label_ty2_value)
-        update_register_label(12, 2, label_current_temp_value)
-        update_register_label(14, 2, label_required_temp_value)
-        update_register_label(16, 2, label_outdoor_temp_value)
-        update_register_label(0, 2, label_cycle_time_value)
-        update_register_label(2, 2, label_full_cycle_time_value)
-        update_register_label(4, 2, label_kp_value)
-        update_register_label(6, 2, label_ki_value)
-        update_register_label(8, 2, label_kd_value)
-        update_register_label(10, 2, label_dead_zone_value)
-
-        update_register_label(26, 2, label_tx1_value2)
-        update_register_label(28, 2, label_ty1_value2)
-        update_register_label(30, 2, label_tx2_value2)
-        update_register_label(32, 2, label_ty2_value2)
-        update_register_label(36, 2, label_current_temp_value2)
-        update_register_label(34, 2, label_required_temp_value2)
-        update_register_label(16, 2, label_outdoor_temp_value2)
-        update_register_label(38, 2, label_cycle_time_value2)
-        update_register_label(40, 2, label_full_cycle_time_value2)
-        update_register_label(42, 2, label_kp_value2)
-        update_register_label(44, 2, label_ki_value2)
-        update_register_label(46, 2, label_kd_value2)
-        update_register_label(48, 2, label_dead_zone_value2)
-
-        update_register_label(54, 2, label_boiler_temp_value)
-        update_register_label(50, 2, label_boiler_on_temp_value)
-        update_register_label(52, 2, label_boiler_off_temp_value)
-
-        update_register_label(56, 2, label_home_sensor_2_value)
-        update_register_label(58, 2, label_security_sensor_value)
-        update_register_label(60, 2, label_radiator_supply_sensor_value)
-        update_register_label(62, 2, label_floor_supply_sensor_value)
-
-        root.after(10000, update_register_values)  # Обновление каждые 10 секунд
+        for name, label in value_labels:
+            value = values.get(name)
+            if isinstance(value, float):
+                widget_cache.config(label, text=f"{value:.1f}")
+            elif value is not None:
+                widget_cache.config(label, text=str(value))
     except Exception as e:
         logger.error(f"Ошибка при обновлении значений регистров: {e}")
 
 
-def write_input_values():
-    """Запись значений из полей ввода в регистры."""
-    try:
-        value_tx1 = float(entry_tx1.get())
-        if -80 <= value_tx1 <= 80:
-            write_registers(client, 18, value_tx1)
-        else:
-            logger.error("Некорректное значение для T_X1. Допустимый диапазон: -80 до 80")
-
-        value_ty1 = float(entry_ty1.get())
-        if -80 <= value_ty1 <= 80:
-            write_registers(client, 20, value_ty1)
-        else:
-            logger.error("Некорректное значение для T_Y1. Допустимый диапазон: -80 до 80")
-
-        value_tx2 = float(entry_tx2.get())
-        if -80 <= value_tx2 <= 80:
-            write_registers(client, 22, value_tx2)
-        else:
-            logger.error("Некорректное значение для T_X2. Допустимый диапазон: -80 до 80")
+def set_stale(stale):
+    """Отметка значений как устаревших, пока нет связи с устройством."""
+    for _, label in value_labels:
+        widget_cache.config(label, fg="grey" if stale else "black")
 
-        value_ty2 = float(entry_ty2.get())
-        if -80 <= value_ty2 <= 80:
-            write_registers(client, 24, value_ty2)
-        else:
-            logger.error("Некорректное значение для T_Y2. Допустимый диапазон: -80 до 80")
 
-        update_register_values()  # Обновить значения на экране после записи
-    except ValueError:
-        logger.error("Некорректное значение в поле ввода")
-    except Exception as e:
-        logger.error(f"Ошибка при записи значений: {e}")
-
-
-def write_new_register_values():
-    """Запись значений из полей ввода в новые регистры."""
+def process_snapshots():
+    """Перенос снимков от потока опроса в GUI."""
+    global coils_stale
     try:
-        value_cycle_time = float(entry_cycle_time.get())
-        write_registers(client, 0, value_cycle_time)
-
-        value_full_cycle_time = float(entry_full_cycle_time.get())
-        write_registers(client, 2, value_full_cycle_time)
-
-        value_kp = float(entry_kp.get())
-        write_registers(client, 4, value_kp)
-
-        value_ki = float(entry_ki.get())
-        write_registers(client, 6, value_ki)
-
-        value_kd = float(entry_kd.get())
-        write_registers(client, 8, value_kd)
-
-        value_dead_zone = float(entry_dead_zone.get())
-        write_registers(client, 10, value_dead_zone)
-
-        update_register_values()  # Обновить значения на экране после записи
-    except ValueError:
-        logger.error("Некорректное значение в поле ввода")
+        while True:
+            kind, data = poller.snapshots.get_nowait()
+            if kind == "coils":
+                coils_stale = False
+                update_labels(data)
+            elif kind == "registers":
+                update_register_values(data)
+            elif kind == "link":
+                set_stale(not data)
+                # Без связи запись катушек отклоняется: кнопки недоступны до восстановления связи
+                set_coils_stale(not data)
+    except queue.Empty:
+        pass
+    root.after(100, process_snapshots)  # Проверка очереди каждые 100 мс
+
+
+def update_diagnostics():
+    """Обновление рамки диагностики по метрикам потока опроса."""
+    try:
+        snapshot = poller.metrics.snapshot()
+        counters = snapshot["counters"]
+        histograms = snapshot["histograms"]
+        cycle = histograms.get("cycle", {})
+        widget_cache.config(diagnostics_counters, text=(
+            f"Запросов: {counters.get('requests', 0)}   Тайм-аутов: {counters.get('timeouts', 0)}   "
+            f"Исключений: {counters.get('exceptions', 0)}   Ошибок: {counters.get('errors', 0)}   "
+            f"Переподключений: {counters.get('reconnects', 0)}   "
+            f"Цикл: {snapshot['gauges'].get('cycle_duration', 0) * 1000:.0f} мс "
+            f"(p99 {cycle.get('p99', 0) * 1000:.0f} мс)"))
+        widget_cache.config(diagnostics_latency, text="   ".join(
+            f"{name}: p50 {summary['p50'] * 1000:.1f} / p99 {summary['p99'] * 1000:.1f} мс"
+            for name, summary in histograms.items() if name.startswith("FC") and " " not in name))
     except Exception as e:
-        logger.error(f"Ошибка при записи новых значений: {e}")
+        logger.error(f"Ошибка при обновлении диагностики: {e}")
+    root.after(1000, update_diagnostics)  # Обновление диагностики раз в секунду
 
 
-def write_input_values2():
-    """Запись значений из полей ввода в регистры для второго контура."""
+def dump_metrics():
+    """Сохранение снимка метрик опроса в JSON файл."""
     try:
-        value_tx1 = float(entry_tx1_2.get())
-        if -80 <= value_tx1 <= 80:
-            write_registers(client, 26, value_tx1)
-        else:
-            logger.error("Некорректное значение для X1. Допустимый диапазон: -80 до 80")
+        poller.metrics.dump(METRICS_PATH)
+        logger.info(f"Метрики опроса сохранены в {METRICS_PATH}")
+    except OSError as e:
+        logger.error(f"Ошибка при сохранении метрик в {METRICS_PATH}: {e}")
 
-        value_ty1 = float(entry_ty1_2.get())
-        if -80 <= value_ty1 <= 80:
-            write_registers(client, 28, value_ty1)
-        else:
-            logger.error("Некорректное значение для Y1. Допустимый диапазон: -80 до 80")
-
-        value_tx2 = float(entry_tx2_2.get())
-        if -80 <= value_tx2 <= 80:
-            write_registers(client, 30, value_tx2)
-        else:
-            logger.error("Некорректное значение для X2. Допустимый диапазон: -80 до 80")
 
-        value_ty2 = float(entry_ty2_2.get())
-        if -80 <= value_ty2 <= 80:
-            write_registers(client, 32, value_ty2)
-        else:
-            logger.error("Некорректное значение для Y2. Допустимый диапазон: -80 до 80")
-
-        update_register_values()  # Обновить значения на экране после записи
-    except ValueError:
-        logger.error("Некорректное значение в поле ввода")
+def query_trend(names, start, end):
+    """Чтение рядов графика из архива в рабочем потоке: запрос может читать файлы на диске."""
+    try:
+        series = []
+        for name, color in zip(names, TREND_COLORS):
+            timestamps, values, _ = poller.historian.window(name, start, end)
+            series.append((register_map.tag(name).label, color, timestamps, values))
+        trend_results.put((series, start, end))
     except Exception as e:
-        logger.error(f"Ошибка при записи значений для второго контура: {e}")
-
-
-def write_new_register_values2():
-    """Запись значений из полей ввода в новые регистры для второго контура."""
+        logger.error(f"Ошибка при чтении архива для графика трендов: {e}")
+        trend_results.put(None)
+
+
+def update_trend():
+    """Запуск запроса графика трендов; пока выполняется предыдущий, запрос откладывается."""
+    global trend_query, trend_pending
+    if trend_query is not None and trend_query.is_alive():
+        trend_pending = True
+        return
+    trend_pending = False
+    trend = next(trend for trend in register_map.trends if trend["text"] == trend_name.get())
+    end = now_ms()
+    start = end - TREND_WINDOWS[trend_window.get()] * 1000
+    trend_query = threading.Thread(target=query_trend, args=(trend["tags"], start, end), name="trend-query",
+                                   daemon=True)
+    trend_query.start()
+    root.after(50, draw_trend)
+
+
+def draw_trend():
+    """Перерисовка графика, когда рабочий поток вернул ряды."""
     try:
-        value_cycle_time = float(entry_cycle_time2.get())
-        write_registers(client, 38, value_cycle_time)
-
-        value_full_cycle_time = float(entry_full_cycle_time2.get())
-        write_registers(client, 40, value_full_cycle_time)
-
-        value_kp = float(entry_kp2.get())
-        write_registers(client, 42, value_kp)
-
-        value_ki = float(entry_ki2.get())
-        write_registers(client, 44, value_ki)
+        result = trend_results.get_nowait()
+    except queue.Empty:
+        root.after(50, draw_trend)
+        return
+    try:
+        if result is not None:
+            trend_chart.draw(*result)
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении графика трендов: {e}")
+    if trend_pending:
+        update_trend()
 
-        value_kd = float(entry_kd2.get())
-        write_registers(client, 46, value_kd)
 
-        value_dead_zone = float(entry_dead_zone2.get())
-        write_registers(client, 48, value_dead_zone)
+def schedule_trend():
+    """Периодическое обновление графика трендов."""
+    update_trend()
+    root.after(5000, schedule_trend)  # Обновление графика раз в 5 секунд
 
-        update_register_values()  # Обновить значения на экране после записи
-    except ValueError:
-        logger.error("Некорректное значение в поле ввода")
-    except Exception as e:
-        logger.error(f"Ошибка при записи новых значений для второго контура: {e}")
 
+def write_group_values(group):
+    """Запись изменённых значений из полей ввода группы в регистры.
 
-def write_boiler_values():
-    """Запись значений из полей ввода в регистры для бойлера."""
+    Пустые поля пропускаются, поэтому можно изменить только часть группы;
+    поток опроса отправит лишь значения, отличающиеся от прочитанных.
+    """
     try:
-        value_boiler_on_temp = float(entry_boiler_on_temp.get())
-        if 30 <= value_boiler_on_temp <= 50:
-            write_registers(client, 50, value_boiler_on_temp)
-        else:
-            logger.error("Некорректное значение для ТЕМП ВКЛ НАГРЕВА ГВС. Допустимый диапазон: 30 до 50")
-
-        value_boiler_off_temp = float(entry_boiler_off_temp.get())
-        if 30 <= value_boiler_off_temp <= 50:
-            write_registers(client, 52, value_boiler_off_temp)
-        else:
-            logger.error("Некорректное значение для ТЕМП ВЫКЛ НАГРЕВА ГВС. Допустимый диапазон: 30 до 50")
-
-        update_register_values()  # Обновить значения на экране после записи
-    except ValueError:
-        logger.error("Некорректное значение в поле ввода")
+        values = {}
+        for tag in register_map.group_tags(group["name"]):
+            text = entries[tag.name].get().strip()
+            if not text:
+                continue
+            try:
+                value = float(text)
+            except ValueError:
+                logger.error(f"Некорректное значение в поле ввода {tag.label}: {text}")
+                continue
+            if tag.in_range(value):
+                values[tag.address] = value
+            else:
+                low, high = tag.range
+                logger.error(f"Некорректное значение для {tag.label}. Допустимый диапазон: {low} до {high}")
+        if values:
+            poller.send("write_values", values)
     except Exception as e:
-        logger.error(f"Ошибка при записи значений для бойлера: {e}")
+        logger.error(f"Ошибка при записи значений группы {group['text']}: {e}")
+
+
+def create_tag_widgets(frame, tag):
+    """Создание виджетов тега по описанию из карты регистров."""
+    widget = tag.widget
+    row = widget["row"]
+    if widget["kind"] == "value":
+        label = tk.Label(frame, text=widget["text"], font=("Arial", 12))
+        label.grid(row=row, column=0, pady=5, sticky="e")
+        label_value = tk.Label(frame, text="0.0", font=("Arial", 12))
+        label_value.grid(row=row, column=1, pady=5, sticky="w")
+        value_labels.append((tag.name, label_value))
+        if widget.get("entry"):
+            entry = tk.Entry(frame, font=("Arial", 12))
+            entry.grid(row=row, column=2, pady=5, padx=10)
+            entries[tag.name] = entry
+    elif widget["kind"] == "button":
+        button = tk.Button(frame, text=widget["text"], command=lambda: toggle_flag(tag.address), bg="grey",
+                           width=widget.get("width", 20), height=2)
+        button.grid(row=row, column=0, columnspan=widget.get("columnspan", 1), pady=5)
+        if widget.get("lamp"):
+            lamp = tk.Canvas(frame, width=40, height=40, bg="grey")
+            lamp.grid(row=row, column=1, pady=5, padx=10)
+            coil_lamps.append((tag.address, lamp))
+        else:
+            coil_buttons.append((tag.address, button))
+    elif widget["kind"] == "lamp":
+        lamp = tk.Canvas(frame, width=40, height=40, bg="grey")
+        lamp.grid(row=row, column=1, pady=5, padx=10)
+        coil_lamps.append((tag.address, lamp))
+        if "text" in widget:
+            label = tk.Label(frame, text=widget["text"], font=("Arial", 12))
+            label.grid(row=row, column=0, pady=5, sticky="e")
 
 
 # Настройка GUI
 root = tk.Tk()
 root.title("Панель управления Modbus")
 
-# Первый контур
-label_frame1 = tk.LabelFrame(root, text="Контур 1", padx=10, pady=5)
-label_frame1.grid(row=0, column=0, padx=10, pady=5, sticky="nsew")
-
-button_auto = tk.Button(label_frame1, text="АВТО", command=lambda: toggle_flag(0), bg="grey", width=20, height=2)
-button_auto.grid(row=0, column=0, pady=5)
-
-button_open = tk.Button(label_frame1, text="ОТКР", command=lambda: toggle_flag(1), bg="grey", width=20, height=2)
-button_open.grid(row=1, column=0, pady=5)
-
-button_close = tk.Button(label_frame1, text="ЗАКР", command=lambda: toggle_flag(2), bg="grey", width=20, height=2)
-button_close.grid(row=2, column=0, pady=5)
-
-label_opening = tk.Canvas(label_frame1, width=40, height=40, bg="grey")
-label_opening.grid(row=1, column=1, pady=5, padx=10)
-label_closing = tk.Canvas(label_frame1, width=40, height=40, bg="grey")
-label_closing.grid(row=2, column=1, pady=5, padx=10)
-
-label_tx1 = tk.Label(label_frame1, text="T_X1:", font=("Arial", 12))
-label_tx1.grid(row=3, column=0, pady=5, sticky="e")
-label_tx1_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_tx1_value.grid(row=3, column=1, pady=5, sticky="w")
-
-label_ty1 = tk.Label(label_frame1, text="T_Y1:", font=("Arial", 12))
-label_ty1.grid(row=4, column=0, pady=5, sticky="e")
-label_ty1_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_ty1_value.grid(row=4, column=1, pady=5, sticky="w")
-
-label_tx2 = tk.Label(label_frame1, text="T_X2:", font=("Arial", 12))
-label_tx2.grid(row=5, column=0, pady=5, sticky="e")
-label_tx2_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_tx2_value.grid(row=5, column=1, pady=5, sticky="w")
-
-label_ty2 = tk.Label(label_frame1, text="T_Y2:", font=("Arial", 12))
-label_ty2.grid(row=6, column=0, pady=5, sticky="e")
-label_ty2_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_ty2_value.grid(row=6, column=1, pady=5, sticky="w")
-
-entry_tx1 = tk.Entry(label_frame1, font=("Arial", 12))
-entry_tx1.grid(row=3, column=2, pady=5, padx=10)
-entry_ty1 = tk.Entry(label_frame1, font=("Arial", 12))
-entry_ty1.grid(row=4, column=2, pady=5, padx=10)
-entry_tx2 = tk.Entry(label_frame1, font=("Arial", 12))
-entry_tx2.grid(row=5, column=2, pady=5, padx=10)
-entry_ty2 = tk.Entry(label_frame1, font=("Arial", 12))
-entry_ty2.grid(row=6, column=2, pady=5, padx=10)
-
-button_write = tk.Button(label_frame1, text="ЗАПИСАТЬ", command=write_input_values, bg="blue", fg="white", width=20,
-                         height=2)
-button_write.grid(row=7, column=0, columnspan=3, pady=5)
-
-temp_frame1 = tk.LabelFrame(label_frame1, text="Температуры", padx=5, pady=5)
-temp_frame1.grid(row=8, column=0, columnspan=3, pady=5, padx=5, sticky="nsew")
-
-label_current_temp = tk.Label(temp_frame1, text="Текущая температура:", font=("Arial", 12))
-label_current_temp.grid(row=0, column=0, pady=5, sticky="e")
-label_current_temp_value = tk.Label(temp_frame1, text="0.0", font=("Arial", 12))
-label_current_temp_value.grid(row=0, column=1, pady=5, sticky="w")
-
-label_required_temp = tk.Label(temp_frame1, text="Требуемая температура:", font=("Arial", 12))
-label_required_temp.grid(row=1, column=0, pady=5, sticky="e")
-label_required_temp_value = tk.Label(temp_frame1, text="0.0", font=("Arial", 12))
-label_required_temp_value.grid(row=1, column=1, pady=5, sticky="w")
-
-label_outdoor_temp = tk.Label(temp_frame1, text="Температура на улице:", font=("Arial", 12))
-label_outdoor_temp.grid(row=2, column=0, pady=5, sticky="e")
-label_outdoor_temp_value = tk.Label(temp_frame1, text="0.0", font=("Arial", 12))
-label_outdoor_temp_value.grid(row=2, column=1, pady=5, sticky="w")
-
-# Добавление новых полей и меток для регистров 0-1, 2-3, 4-5, 6-7, 8-9
-label_cycle_time = tk.Label(label_frame1, text="ВРЕМЯ ЦИКЛА:", font=("Arial", 12))
-label_cycle_time.grid(row=9, column=0, pady=5, sticky="e")
-label_cycle_time_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_cycle_time_value.grid(row=9, column=1, pady=5, sticky="w")
-entry_cycle_time = tk.Entry(label_frame1, font=("Arial", 12))
-entry_cycle_time.grid(row=9, column=2, pady=5, padx=10)
-
-label_full_cycle_time = tk.Label(label_frame1, text="ВРЕМЯ ПОЛНОГО ХОДА:", font=("Arial", 12))
-label_full_cycle_time.grid(row=10, column=0, pady=5, sticky="e")
-label_full_cycle_time_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_full_cycle_time_value.grid(row=10, column=1, pady=5, sticky="w")
-entry_full_cycle_time = tk.Entry(label_frame1, font=("Arial", 12))
-entry_full_cycle_time.grid(row=10, column=2, pady=5, padx=10)
-
-label_kp = tk.Label(label_frame1, text="КОЭФФИЦИЕНТ П:", font=("Arial", 12))
-label_kp.grid(row=11, column=0, pady=5, sticky="e")
-label_kp_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_kp_value.grid(row=11, column=1, pady=5, sticky="w")
-entry_kp = tk.Entry(label_frame1, font=("Arial", 12))
-entry_kp.grid(row=11, column=2, pady=5, padx=10)
-
-label_ki = tk.Label(label_frame1, text="КОЭФФИЦИЕНТ И:", font=("Arial", 12))
-label_ki.grid(row=12, column=0, pady=5, sticky="e")
-label_ki_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_ki_value.grid(row=12, column=1, pady=5, sticky="w")
-entry_ki = tk.Entry(label_frame1, font=("Arial", 12))
-entry_ki.grid(row=12, column=2, pady=5, padx=10)
-
-label_kd = tk.Label(label_frame1, text="КОЭФФИЦИЕНТ Д:", font=("Arial", 12))
-label_kd.grid(row=13, column=0, pady=5, sticky="e")
-label_kd_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_kd_value.grid(row=13, column=1, pady=5, sticky="w")
-entry_kd = tk.Entry(label_frame1, font=("Arial", 12))
-entry_kd.grid(row=13, column=2, pady=5, padx=10)
-
-label_dead_zone = tk.Label(label_frame1, text="ЗОНА НЕЧУВСТВИТЕЛЬНОСТИ:", font=("Arial", 12))
-label_dead_zone.grid(row=14, column=0, pady=5, sticky="e")
-label_dead_zone_value = tk.Label(label_frame1, text="0.0", font=("Arial", 12))
-label_dead_zone_value.grid(row=14, column=1, pady=5, sticky="w")
-entry_dead_zone = tk.Entry(label_frame1, font=("Arial", 12))
-entry_dead_zone.grid(row=14, column=2, pady=5, padx=10)
-
-# Добавление новой кнопки для записи только во вновь созданные регистры
-button_write_new = tk.Button(label_frame1, text="ЗАПИСАТЬ ПИД", command=write_new_register_values, bg="green",
-                             fg="white", width=25, height=2)
-button_write_new.grid(row=15, column=0, columnspan=3, pady=5)
-
-# Второй контур
-label_frame2 = tk.LabelFrame(root, text="Контур 2", padx=10, pady=5)
-label_frame2.grid(row=0, column=1, padx=10, pady=5, sticky="nsew")
-
-button_auto2 = tk.Button(label_frame2, text="АВТО", command=lambda: toggle_flag(5), bg="grey", width=20, height=2)
-button_auto2.grid(row=0, column=0, pady=5)
-
-button_open2 = tk.Button(label_frame2, text="ОТКР", command=lambda: toggle_flag(6), bg="grey", width=20, height=2)
-button_open2.grid(row=1, column=0, pady=5)
-
-button_close2 = tk.Button(label_frame2, text="ЗАКР", command=lambda: toggle_flag(7), bg="grey", width=20, height=2)
-button_close2.grid(row=2, column=0, pady=5)
-
-label_opening2 = tk.Canvas(label_frame2, width=40, height=40, bg="grey")
-label_opening2.grid(row=1, column=1, pady=5, padx=10)
-label_closing2 = tk.Canvas(label_frame2, width=40, height=40, bg="grey")
-label_closing2.grid(row=2, column=1, pady=5, padx=10)
-
-label_tx1_2 = tk.Label(label_frame2, text="X1:", font=("Arial", 12))
-label_tx1_2.grid(row=3, column=0, pady=5, sticky="e")
-label_tx1_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_tx1_value2.grid(row=3, column=1, pady=5, sticky="w")
-
-label_ty1_2 = tk.Label(label_frame2, text="Y1:", font=("Arial", 12))
-label_ty1_2.grid(row=4, column=0, pady=5, sticky="e")
-label_ty1_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_ty1_value2.grid(row=4, column=1, pady=5, sticky="w")
-
-label_tx2_2 = tk.Label(label_frame2, text="X2:", font=("Arial", 12))
-label_tx2_2.grid(row=5, column=0, pady=5, sticky="e")
-label_tx2_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_tx2_value2.grid(row=5, column=1, pady=5, sticky="w")
-
-label_ty2_2 = tk.Label(label_frame2, text="Y2:", font=("Arial", 12))
-label_ty2_2.grid(row=6, column=0, pady=5, sticky="e")
-label_ty2_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_ty2_value2.grid(row=6, column=1, pady=5, sticky="w")
-
-entry_tx1_2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_tx1_2.grid(row=3, column=2, pady=5, padx=10)
-entry_ty1_2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_ty1_2.grid(row=4, column=2, pady=5, padx=10)
-entry_tx2_2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_tx2_2.grid(row=5, column=2, pady=5, padx=10)
-entry_ty2_2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_ty2_2.grid(row=6, column=2, pady=5, padx=10)
-
-button_write2 = tk.Button(label_frame2, text="ЗАПИСАТЬ", command=write_input_values2, bg="blue", fg="white", width=20,
-                          height=2)
-button_write2.grid(row=7, column=0, columnspan=3, pady=5)
-
-temp_frame2 = tk.LabelFrame(label_frame2, text="Температуры", padx=5, pady=5)
-temp_frame2.grid(row=8, column=0, columnspan=3, pady=5, padx=5, sticky="nsew")
-
-label_current_temp2 = tk.Label(temp_frame2, text="Текущая температура:", font=("Arial", 12))
-label_current_temp2.grid(row=0, column=0, pady=5, sticky="e")
-label_current_temp_value2 = tk.Label(temp_frame2, text="0.0", font=("Arial", 12))
-label_current_temp_value2.grid(row=0, column=1, pady=5, sticky="w")
-
-label_required_temp2 = tk.Label(temp_frame2, text="Требуемая температура:", font=("Arial", 12))
-label_required_temp2.grid(row=1, column=0, pady=5, sticky="e")
-label_required_temp_value2 = tk.Label(temp_frame2, text="0.0", font=("Arial", 12))
-label_required_temp_value2.grid(row=1, column=1, pady=5, sticky="w")
-
-label_outdoor_temp2 = tk.Label(temp_frame2, text="Температура на улице:", font=("Arial", 12))
-label_outdoor_temp2.grid(row=2, column=0, pady=5, sticky="e")
-label_outdoor_temp_value2 = tk.Label(temp_frame2, text="0.0", font=("Arial", 12))
-label_outdoor_temp_value2.grid(row=2, column=1, pady=5, sticky="w")
-
-# Добавление новых полей и меток для регистров 38-39, 40-41, 42-43, 44-45, 46-47, 48-49
-label_cycle_time2 = tk.Label(label_frame2, text="ВРЕМЯ ЦИКЛА:", font=("Arial", 12))
-label_cycle_time2.grid(row=9, column=0, pady=5, sticky="e")
-label_cycle_time_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_cycle_time_value2.grid(row=9, column=1, pady=5, sticky="w")
-entry_cycle_time2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_cycle_time2.grid(row=9, column=2, pady=5, padx=10)
-
-label_full_cycle_time2 = tk.Label(label_frame2, text="ВРЕМЯ ПОЛНОГО ХОДА:", font=("Arial", 12))
-label_full_cycle_time2.grid(row=10, column=0, pady=5, sticky="e")
-label_full_cycle_time_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_full_cycle_time_value2.grid(row=10, column=1, pady=5, sticky="w")
-entry_full_cycle_time2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_full_cycle_time2.grid(row=10, column=2, pady=5, padx=10)
-
-label_kp2 = tk.Label(label_frame2, text="КОЭФФИЦИЕНТ П:", font=("Arial", 12))
-label_kp2.grid(row=11, column=0, pady=5, sticky="e")
-label_kp_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_kp_value2.grid(row=11, column=1, pady=5, sticky="w")
-entry_kp2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_kp2.grid(row=11, column=2, pady=5, padx=10)
-
-label_ki2 = tk.Label(label_frame2, text="КОЭФФИЦИЕНТ И:", font=("Arial", 12))
-label_ki2.grid(row=12, column=0, pady=5, sticky="e")
-label_ki_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_ki_value2.grid(row=12, column=1, pady=5, sticky="w")
-entry_ki2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_ki2.grid(row=12, column=2, pady=5, padx=10)
-
-label_kd2 = tk.Label(label_frame2, text="КОЭФФИЦИЕНТ Д:", font=("Arial", 12))
-label_kd2.grid(row=13, column=0, pady=5, sticky="e")
-label_kd_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_kd_value2.grid(row=13, column=1, pady=5, sticky="w")
-entry_kd2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_kd2.grid(row=13, column=2, pady=5, padx=10)
-
-label_dead_zone2 = tk.Label(label_frame2, text="ЗОНА НЕЧУВСТВИТЕЛЬНОСТИ:", font=("Arial", 12))
-label_dead_zone2.grid(row=14, column=0, pady=5, sticky="e")
-label_dead_zone_value2 = tk.Label(label_frame2, text="0.0", font=("Arial", 12))
-label_dead_zone_value2.grid(row=14, column=1, pady=5, sticky="w")
-entry_dead_zone2 = tk.Entry(label_frame2, font=("Arial", 12))
-entry_dead_zone2.grid(row=14, column=2, pady=5, padx=10)
-
-# Добавление новой кнопки для записи только во вновь созданные регистры
-button_write_new2 = tk.Button(label_frame2, text="ЗАПИСАТЬ ПИД", command=write_new_register_values2, bg="green",
-                              fg="white", width=25, height=2)
-button_write_new2.grid(row=15, column=0, columnspan=3, pady=5)
-
-# Панель для бойлера
-label_frame_boiler = tk.LabelFrame(root, text="Бойлер", padx=10, pady=5)
-label_frame_boiler.grid(row=0, column=2, padx=10, pady=5, sticky="nsew")
-
-label_boiler_temp = tk.Label(label_frame_boiler, text="ТЕМПЕРАТУРА ГВС:", font=("Arial", 12))
-label_boiler_temp.grid(row=0, column=0, pady=5, sticky="e")
-label_boiler_temp_value = tk.Label(label_frame_boiler, text="0.0", font=("Arial", 12))
-label_boiler_temp_value.grid(row=0, column=1, pady=5, sticky="w")
-
-button_boiler_auto = tk.Button(label_frame_boiler, text="АВТО ГВС", command=lambda: toggle_flag(11), bg="grey",
-                               width=20, height=2)
-button_boiler_auto.grid(row=1, column=0, columnspan=2, pady=5)
-
-label_boiler_relay = tk.Canvas(label_frame_boiler, width=40, height=40, bg="grey")
-label_boiler_relay.grid(row=2, column=1, pady=5, padx=10)
-label_boiler_relay_text = tk.Label(label_frame_boiler, text="СОСТОЯНИЕ РЕЛЕ НАГРЕВА ГВС:", font=("Arial", 12))
-label_boiler_relay_text.grid(row=2, column=0, pady=5, sticky="e")
-
-label_boiler_on_temp = tk.Label(label_frame_boiler, text="ТЕМП ВКЛ НАГРЕВА ГВС:", font=("Arial", 12))
-label_boiler_on_temp.grid(row=3, column=0, pady=5, sticky="e")
-label_boiler_on_temp_value = tk.Label(label_frame_boiler, text="0.0", font=("Arial", 12))
-label_boiler_on_temp_value.grid(row=3, column=1, pady=5, sticky="w")
-entry_boiler_on_temp = tk.Entry(label_frame_boiler, font=("Arial", 12))
-entry_boiler_on_temp.grid(row=3, column=2, pady=5, padx=10)
-
-label_boiler_off_temp = tk.Label(label_frame_boiler, text="ТЕМП ВЫКЛ НАГРЕВА ГВС:", font=("Arial", 12))
-label_boiler_off_temp.grid(row=4, column=0, pady=5, sticky="e")
-label_boiler_off_temp_value = tk.Label(label_frame_boiler, text="0.0", font=("Arial", 12))
-label_boiler_off_temp_value.grid(row=4, column=1, pady=5, sticky="w")
-entry_boiler_off_temp = tk.Entry(label_frame_boiler, font=("Arial", 12))
-entry_boiler_off_temp.grid(row=4, column=2, pady=5, padx=10)
-
-button_write_boiler = tk.Button(label_frame_boiler, text="ЗАПИСЬ ГВС", command=write_boiler_values, bg="green",
-                                fg="white", width=25, height=2)
-button_write_boiler.grid(row=5, column=0, columnspan=3, pady=5)
-
-# Панель с коррекцией и датчиками
-label_frame_correction = tk.LabelFrame(root, text="Коррекция и датчики", padx=10, pady=5)
-label_frame_correction.grid(row=0, column=3, padx=10, pady=5, sticky="nsew")
-
-label_home_sensor_2 = tk.Label(label_frame_correction, text="ДАТЧИК ТЕМПЕРАТУРЫ НА ДОМЕ №2:", font=("Arial", 12))
-label_home_sensor_2.grid(row=0, column=0, pady=5, sticky="e")
-label_home_sensor_2_value = tk.Label(label_frame_correction, text="0.0", font=("Arial", 12))
-label_home_sensor_2_value.grid(row=0, column=1, pady=5, sticky="w")
-
-label_security_sensor = tk.Label(label_frame_correction, text="ДАТЧИК ТЕМП НА КОТЕЛЬНОЙ ОХРАНЫ:", font=("Arial", 12))
-label_security_sensor.grid(row=1, column=0, pady=5, sticky="e")
-label_security_sensor_value = tk.Label(label_frame_correction, text="0.0", font=("Arial", 12))
-label_security_sensor_value.grid(row=1, column=1, pady=5, sticky="w")
-
-label_radiator_supply_sensor = tk.Label(label_frame_correction, text="НАРУЖНЫЙ ДАТЧИК ПОДАЧИ РАДИАТОРОВ:",
-                                        font=("Arial", 12))
-label_radiator_supply_sensor.grid(row=2, column=0, pady=5, sticky="e")
-label_radiator_supply_sensor_value = tk.Label(label_frame_correction, text="0.0", font=("Arial", 12))
-label_radiator_supply_sensor_value.grid(row=2, column=1, pady=5, sticky="w")
-
-label_floor_supply_sensor = tk.Label(label_frame_correction, text="НАРУЖНЫЙ ДАТЧИК ПОДАЧИ ТЕПЛОГО ПОЛА:",
-                                     font=("Arial", 12))
-label_floor_supply_sensor.grid(row=3, column=0, pady=5, sticky="e")
-label_floor_supply_sensor_value = tk.Label(label_frame_correction, text="0.0", font=("Arial", 12))
-label_floor_supply_sensor_value.grid(row=3, column=1, pady=5, sticky="w")
-
-button_correction_radiators_plus = tk.Button(label_frame_correction, text="КОРРЕКЦИЯ ТЕМП РАДИАТОРОВ ПЛЮС",
-                                             command=lambda: toggle_flag(12), bg="grey", width=30, height=2)
-button_correction_radiators_plus.grid(row=4, column=0, pady=5)
-label_correction_radiators_plus = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_correction_radiators_plus.grid(row=4, column=1, pady=5, padx=10)
-
-button_correction_radiators_minus = tk.Button(label_frame_correction, text="КОРРЕКЦИЯ ТЕМП РАДИАТОРОВ МИНУС",
-                                              command=lambda: toggle_flag(13), bg="grey", width=30, height=2)
-button_correction_radiators_minus.grid(row=5, column=0, pady=5)
-label_correction_radiators_minus = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_correction_radiators_minus.grid(row=5, column=1, pady=5, padx=10)
-
-button_correction_floor_plus = tk.Button(label_frame_correction, text="КОРРЕКЦИЯ ТЕМП ТЕПЛОГО ПОЛА ПЛЮС",
-                                         command=lambda: toggle_flag(14), bg="grey", width=30, height=2)
-button_correction_floor_plus.grid(row=6, column=0, pady=5)
-label_correction_floor_plus = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_correction_floor_plus.grid(row=6, column=1, pady=5, padx=10)
-
-button_correction_floor_minus = tk.Button(label_frame_correction, text="КОРРЕКЦИЯ ТЕМП ТЕПЛОГО ПОЛА МИНУС",
-                                          command=lambda: toggle_flag(15), bg="grey", width=30, height=2)
-button_correction_floor_minus.grid(row=7, column=0, pady=5)
-label_correction_floor_minus = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_correction_floor_minus.grid(row=7, column=1, pady=5, padx=10)
-
-button_sensor_selection = tk.Button(label_frame_correction, text="ВЫБОР ДАТЧИКОВ НА ДОМЕ 1 ИЛИ 2",
-                                    command=lambda: toggle_flag(16), bg="grey", width=30, height=2)
-button_sensor_selection.grid(row=8, column=0, pady=5)
-label_sensor_selection = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_sensor_selection.grid(row=8, column=1, pady=5, padx=10)
-
-button_external_sensor_activation = tk.Button(label_frame_correction, text="ВКЛЮЧЕНИЕ ВНЕШНИХ ДАТЧИКОВ",
-                                              command=lambda: toggle_flag(17), bg="grey", width=30, height=2)
-button_external_sensor_activation.grid(row=9, column=0, pady=5)
-label_external_sensor_activation = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_external_sensor_activation.grid(row=9, column=1, pady=5, padx=10)
-
-button_external_sensor_record = tk.Button(label_frame_correction, text="ЗАПИСЬ РЕГИСТРОВ ВНЕШНИХ ДАТЧИКОВ ТЕМП",
-                                          command=lambda: toggle_flag(18), bg="grey", width=30, height=2)
-button_external_sensor_record.grid(row=10, column=0, pady=5)
-label_external_sensor_record = tk.Canvas(label_frame_correction, width=40, height=40, bg="grey")
-label_external_sensor_record.grid(row=10, column=1, pady=5, padx=10)
-
-# Инициализация состояний флагов и цветов кнопок
-update_labels()
-
-# Проверка подключения
-if not client.is_open:
-    if not client.open():
-        logger.error("Не удалось установить соединение с устройством Modbus.")
-    else:
-        logger.info("Соединение с устройством Modbus установлено.")
-
-# Запуск обновления значений регистров
-update_register_values()
+# Рамки контуров, бойлера и коррекции
+for frame_spec in register_map.frames:
+    parent = frames.get(frame_spec.get("parent"), root)
+    padding = 5 if parent is not root else 10
+    frame = tk.LabelFrame(parent, text=frame_spec["text"], padx=padding, pady=5)
+    frame.grid(row=frame_spec["row"], column=frame_spec["column"], columnspan=frame_spec.get("columnspan", 1),
+               padx=padding, pady=5, sticky="nsew")
+    frames[frame_spec["name"]] = frame
+
+# Кнопки, индикаторы, значения и поля ввода тегов
+for frame_name, frame_tags in register_map.layout.items():
+    for tag in frame_tags:
+        create_tag_widgets(frames[frame_name], tag)
+
+# Кнопки записи групп параметров
+for group in register_map.groups:
+    button_write = tk.Button(frames[group["frame"]], text=group["text"], command=lambda g=group: write_group_values(g),
+                             bg=group["bg"], fg="white", width=group["width"], height=2)
+    button_write.grid(row=group["row"], column=0, columnspan=3, pady=5)
+
+# Диагностика опроса: счётчики, длительность цикла и задержки по кодам функций
+diagnostics_frame = tk.LabelFrame(root, text="Диагностика", padx=10, pady=5)
+diagnostics_frame.grid(row=1, column=0, columnspan=4, padx=10, pady=5, sticky="nsew")
+diagnostics_counters = tk.Label(diagnostics_frame, text="", font=("Arial", 10))
+diagnostics_counters.grid(row=0, column=0, sticky="w")
+diagnostics_latency = tk.Label(diagnostics_frame, text="", font=("Arial", 10))
+diagnostics_latency.grid(row=1, column=0, sticky="w")
+button_dump = tk.Button(diagnostics_frame, text="СОХРАНИТЬ JSON", command=dump_metrics, width=20)
+button_dump.grid(row=0, column=1, rowspan=2, padx=10)
+
+# График трендов: выбор набора тегов и интервала
+if register_map.trends:
+    trend_frame = tk.LabelFrame(root, text="Тренды", padx=10, pady=5)
+    trend_frame.grid(row=2, column=0, columnspan=4, padx=10, pady=5, sticky="nsew")
+    trend_name = tk.StringVar(value=register_map.trends[0]["text"])
+    trend_window = tk.StringVar(value=next(iter(TREND_WINDOWS)))
+    tk.OptionMenu(trend_frame, trend_name, *(trend["text"] for trend in register_map.trends),
+                  command=lambda _: update_trend()).grid(row=0, column=0, sticky="w")
+    tk.OptionMenu(trend_frame, trend_window, *TREND_WINDOWS,
+                  command=lambda _: update_trend()).grid(row=0, column=1, sticky="w")
+    trend_chart = TrendChart(trend_frame, width=900, height=220)
+    trend_chart.grid(row=1, column=0, columnspan=2, pady=5)
+
+# Последнее сохранённое состояние показывается сразу, как устаревшее, до первого опроса
+state = load_state(register_map.state_file) if register_map.state_file else None
+if state is not None:
+    saved_values, saved_coils, saved_at = state
+    update_register_values(saved_values)
+    update_labels(saved_coils)
+    set_stale(True)
+    set_coils_stale(True)
+    logger.info(f"Показано сохранённое состояние ({(now_ms() - saved_at) / 1000:.0f} с назад)")
+
+# Запуск потока опроса по классам опроса карты регистров
+poller = Poller(client, register_map)
+poller.start()
+
+# HTTP сервер метрик для Prometheus, если он задан в карте регистров
+metrics_server = None
+if register_map.metrics:
+    try:
+        metrics_server = MetricsServer(poller, register_map, **register_map.metrics)
+        metrics_server.start()
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик: {e}")
+
+process_snapshots()
+update_diagnostics()
+if register_map.trends:
+    schedule_trend()
 
 root.mainloop()
 
-# Закрытие соединения с клиентом при завершении
-client.close()
+# Остановка сервера метрик, потока опроса и закрытие соединения при завершении
+if metrics_server is not None:
+    metrics_server.stop()
+poller.stop()
 logger.info("Соединение закрыто.")
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+import mbap
+from async_client import AsyncModbusClient
+
+
+async def exchange(request, response_pdu, unit_id=1):
+    """Отправка запроса клиентом на сервер, отвечающий заданным PDU."""
+    async def handle(reader, writer):
+        transaction_id, _, _ = await mbap.read_adu(reader)
+        writer.write(mbap.build_adu(transaction_id, unit_id, response_pdu))
+        await writer.drain()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    client = AsyncModbusClient("127.0.0.1", server.sockets[0].getsockname()[1], timeout=2)
+    try:
+        return await request(client)
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+
+def read_registers(client):
+    return client.read_holding_registers(10, 2)
+
+
+@pytest.mark.parametrize("response, unit_id, expected", [
+    (mbap.registers_response([1, 2]), 1, [1, 2]),
+    (mbap.registers_response([1, 2]), 7, None),
+    (mbap.coils_response([True] * 32), 1, None),
+    (mbap.exception_pdu(mbap.READ_HOLDING_REGISTERS, mbap.ILLEGAL_DATA_ADDRESS), 1, None),
+    (mbap.registers_response([1, 2, 3]), 1, None),
+    (mbap.registers_response([1, 2])[:-1], 1, None),
+])
+def test_read_response_validated(response, unit_id, expected):
+    """Ответ с чужим устройством, кодом функции или длиной данных не принимается за значения."""
+    assert asyncio.run(exchange(read_registers, response, unit_id)) == expected
+
+
+def test_coils_and_writes_validated():
+    """Счётчик байт FC01 и повтор запроса в ответах на запись сверяются с запросом."""
+    assert asyncio.run(exchange(lambda client: client.read_coils(0, 9), mbap.coils_response([True] * 9))) == [True] * 9
+    assert asyncio.run(exchange(lambda client: client.read_coils(0, 9), mbap.coils_response([True] * 8))) is None
+
+    request = mbap.write_coil_request(3, True)
+    assert asyncio.run(exchange(lambda client: client.write_single_coil(3, True), request)) is True
+    assert asyncio.run(exchange(lambda client: client.write_single_coil(3, True),
+                                mbap.write_coil_request(4, True))) is False
+    assert asyncio.run(exchange(lambda client: client.write_multiple_registers(5, [1, 2]),
+                                mbap.write_registers_request(5, [1, 2])[:5])) is True
+    assert asyncio.run(exchange(lambda client: client.write_multiple_registers(5, [1, 2]),
+                                mbap.write_registers_request(5, [1])[:5])) is False
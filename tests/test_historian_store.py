@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+
+from historian_store import DAY_MS, FILES_CACHE_SIZE, RECORD_DTYPE, HistorianStore
+
+START = 1_700_000_000_000 // DAY_MS * DAY_MS
+
+
+def samples(first, count):
+    timestamps = START + (first + np.arange(count, dtype=np.int64)) * 1000
+    return timestamps, np.arange(first, first + count, dtype=np.float32), np.ones(count, dtype=np.uint8)
+
+
+def test_append_after_torn_record(tmp_path):
+    """Неполная запись после сбоя обрезается, следующие записи суток не смещаются."""
+    store = HistorianStore(str(tmp_path))
+    store.append("temp", *samples(0, 10))
+    with open(store.path("temp", START // DAY_MS), "ab") as f:
+        f.write(b"\x01\x02\x03\x04\x05")
+
+    store.append("temp", *samples(10, 10))
+
+    assert os.path.getsize(store.path("temp", START // DAY_MS)) == 20 * RECORD_DTYPE.itemsize
+    timestamps, values, quality = store.window("temp", START, START + DAY_MS)
+    expected_timestamps, expected_values, _ = samples(0, 20)
+    np.testing.assert_array_equal(timestamps, expected_timestamps)
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(quality, 1)
+    np.testing.assert_array_equal(store.window("temp", START + 12_000, START + 15_000)[1], [12, 13, 14])
+
+
+def test_seal_interrupted_before_removing_records(tmp_path):
+    """Файл записей, оставшийся после замены блока, не даёт повторов ни при чтении, ни при повторном сжатии."""
+    store = HistorianStore(str(tmp_path))
+    day = START // DAY_MS
+    store.append("temp", *samples(0, 10))
+    with open(store.path("temp", day), "rb") as f:
+        records = f.read()
+    assert store.seal("temp", day)
+    # Сбой между заменой сжатого блока и удалением файла записей, затем дописывание поздних записей
+    with open(store.path("temp", day), "wb") as f:
+        f.write(records)
+    store.append("temp", *samples(10, 5))
+
+    expected_timestamps, expected_values, _ = samples(0, 15)
+    np.testing.assert_array_equal(store.window("temp", START, START + DAY_MS)[0], expected_timestamps)
+    assert store.seal("temp", day)
+    assert not os.path.exists(store.path("temp", day))
+    np.testing.assert_array_equal(store.window("temp", START, START + DAY_MS)[1], expected_values)
+
+    # Новый файл записей после завершённого сжатия читается целиком
+    store.append("temp", *samples(15, 5))
+    np.testing.assert_array_equal(store.window("temp", START, START + DAY_MS)[1], samples(0, 20)[1])
+    assert store.seal("temp", day)
+    np.testing.assert_array_equal(store.window("temp", START, START + DAY_MS)[0], samples(0, 20)[0])
+
+
+def test_memory_maps_bounded_and_dropped_on_seal(tmp_path):
+    """Отображения файлов записей ограничены по числу и снимаются до удаления файла при сжатии."""
+    store = HistorianStore(str(tmp_path))
+    days = FILES_CACHE_SIZE + 8
+    for day in range(days):
+        timestamps, values, quality = samples(0, 10)
+        store.append("temp", timestamps + day * DAY_MS, values, quality)
+    assert len(store.window("temp", START, START + days * DAY_MS)[0]) == days * 10
+    assert len(store._files) == FILES_CACHE_SIZE
+
+    last = START // DAY_MS + days - 1
+    assert store.path("temp", last) in store._files
+    assert store.seal("temp", last)
+    assert store.path("temp", last) not in store._files
+    assert len(store.window("temp", last * DAY_MS, (last + 1) * DAY_MS)[0]) == 10
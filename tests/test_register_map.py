@@ -0,0 +1,35 @@
+import os
+
+from register_map import DEFAULT_MAP_PATH, load_register_map
+
+
+def read_addresses(decoders):
+    return {address for decoder in decoders for address in range(decoder.start, decoder.start + decoder.count)}
+
+
+def test_poll_class_plans_do_not_read_other_classes():
+    """Блоки быстрого класса не захватывают регистры медленного и наоборот."""
+    register_map = load_register_map()
+    classes = {}
+    for tag in register_map.register_tags:
+        classes.setdefault(tag.poll, set()).update(range(tag.address, tag.address + tag.width))
+
+    fast = read_addresses(register_map.compile_reads([tag for tag in register_map.register_tags
+                                                      if tag.poll == "fast"]))
+    slow = read_addresses(register_map.compile_reads([tag for tag in register_map.register_tags
+                                                      if tag.poll == "slow"]))
+
+    assert fast >= classes["fast"] and not fast & classes["slow"]
+    assert slow >= classes["slow"] and not slow & classes["fast"]
+    # Полное перечитывание (после подключения) - по-прежнему один блок
+    assert len(register_map.compile_reads(register_map.register_tags)) == 1
+
+
+def test_relative_paths_resolved_against_map_directory(tmp_path, monkeypatch):
+    """Пути архива и файла состояния не зависят от текущего каталога процесса."""
+    monkeypatch.chdir(tmp_path)
+    register_map = load_register_map()
+    directory = os.path.dirname(os.path.abspath(DEFAULT_MAP_PATH))
+
+    assert register_map.historian["path"] == os.path.join(directory, "history")
+    assert register_map.state_file == os.path.join(directory, "last_state.json")
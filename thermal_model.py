@@ -0,0 +1,145 @@
+import numpy as np
+
+# Адреса регистров float32 и катушек контуров (контур 1, контур 2)
+CYCLE_TIME = (0, 38)
+FULL_STROKE = (2, 40)
+KP = (4, 42)
+KI = (6, 44)
+KD = (8, 46)
+DEAD_ZONE = (10, 48)
+CURRENT_TEMP = (12, 36)
+REQUIRED_TEMP = (14, 34)
+CURVE_X1 = (18, 26)
+CURVE_Y1 = (20, 28)
+CURVE_X2 = (22, 30)
+CURVE_Y2 = (24, 32)
+SUPPLY_SENSOR = (60, 62)
+COIL_AUTO = (0, 5)
+COIL_MANUAL_OPEN = (1, 6)
+COIL_MANUAL_CLOSE = (2, 7)
+COIL_OPENING = (3, 8)
+COIL_CLOSING = (4, 9)
+
+# Адреса регистров и катушек бойлера (ГВС) и датчиков
+OUTDOOR_TEMP = 16
+BOILER_ON_TEMP = 50
+BOILER_OFF_TEMP = 52
+BOILER_TEMP = 54
+HOME_SENSOR = 56
+COIL_BOILER_RELAY = 10
+COIL_BOILER_AUTO = 11
+
+# Регистры, которые модель записывает на каждом шаге
+OUTPUT_REGISTERS = (OUTDOOR_TEMP, BOILER_TEMP, HOME_SENSOR) + CURRENT_TEMP + REQUIRED_TEMP + SUPPLY_SENSOR
+
+# Физические параметры
+SOURCE_TEMP = 75.0          # температура теплоносителя от источника, °C
+FLOW_TAU = 60.0             # постоянная времени подачи после смесителя, с
+RETURN_FRACTION = 0.5       # доля перепада подача/помещение, остающаяся в обратке
+ROOM_CAPACITY = 20000.0     # теплоёмкость дома, кДж/К
+UA_LOSS = 0.25              # теплопотери дома, кВт/К
+UA_EMITTERS = (0.15, 0.1)    # теплоотдача радиаторов и тёплого пола, кВт/К
+BOILER_HEAT_RATE = 0.02     # нагрев бойлера при включённом реле, °C/с
+BOILER_LOSS_TAU = 20000.0   # постоянная остывания бойлера, с
+BOILER_AMBIENT = 20.0       # температура в котельной, °C
+
+
+def column(address):
+    """Номер столбца float32 в массиве значений по адресу регистра."""
+    return address // 2
+
+
+class HeatingModel:
+    """Векторизованная тепловая модель для набора домов.
+
+    Состояние каждого дома хранится в массивах NumPy: массивы (N,) для дома
+    и бойлера, (N, 2) для двух контуров. step() читает уставки и режимы из
+    массива значений float32 (N, регистры/2) и катушек (N, катушки), как их
+    видит контроллер, продвигает модель на dt секунд и записывает измерения
+    и состояния реле обратно в эти массивы.
+    """
+
+    def __init__(self, houses, outdoor_mean=-5.0, outdoor_swing=5.0, seed=None):
+        rng = np.random.default_rng(seed)
+        self.houses = houses
+        self.time = 0.0
+        self.outdoor_mean = outdoor_mean
+        self.outdoor_swing = outdoor_swing
+        self.outdoor_phase = rng.uniform(0.0, 2 * np.pi, houses)
+        self.heat_loss = UA_LOSS * rng.uniform(0.8, 1.2, houses)
+        self.room = np.full(houses, 21.0)
+        self.flow = np.tile([45.0, 33.0], (houses, 1))
+        self.valve = np.full((houses, 2), 0.5)
+        self.boiler = np.full(houses, 44.0)
+        self.relay = np.zeros(houses, dtype=bool)
+        self.integral = np.zeros((houses, 2))
+        self.prev_error = np.zeros((houses, 2))
+        self.cycle_clock = np.zeros((houses, 2))
+        self.pulse = np.zeros((houses, 2))
+
+    def step(self, values, coils, dt):
+        """Шаг модели на dt секунд."""
+        self.time += dt
+
+        def circuit(addresses):
+            return values[:, [column(address) for address in addresses]]
+
+        # Наружная температура: суточное колебание
+        outdoor = self.outdoor_mean + self.outdoor_swing * np.sin(2 * np.pi * self.time / 86400 + self.outdoor_phase)
+
+        # Требуемая температура подачи по графику X1/Y1 - X2/Y2
+        x1, y1, x2, y2 = circuit(CURVE_X1), circuit(CURVE_Y1), circuit(CURVE_X2), circuit(CURVE_Y2)
+        span = np.where(x2 != x1, x2 - x1, 1.0)
+        required = y1 + (y2 - y1) * (outdoor[:, None] - x1) / span
+        required = np.clip(required, np.minimum(y1, y2), np.maximum(y1, y2))
+
+        # ПИД регулятор смесительного клапана: импульс ОТКР/ЗАКР раз в цикл
+        cycle_time = np.maximum(circuit(CYCLE_TIME), dt)
+        self.cycle_clock += dt
+        due = self.cycle_clock >= cycle_time
+        error = required - self.flow
+        active = due & (np.abs(error) > circuit(DEAD_ZONE))
+        self.integral = np.where(active, np.clip(self.integral + error * cycle_time, -1e4, 1e4), self.integral)
+        output = circuit(KP) * error + circuit(KI) * self.integral + circuit(KD) * (error - self.prev_error) / cycle_time
+        self.pulse = np.where(due, np.where(active, np.clip(output, -cycle_time, cycle_time), 0.0), self.pulse)
+        self.prev_error = np.where(due, error, self.prev_error)
+        self.cycle_clock = np.where(due, 0.0, self.cycle_clock)
+
+        auto = coils[:, COIL_AUTO]
+        opening = np.where(auto, self.pulse > 0, coils[:, COIL_MANUAL_OPEN])
+        closing = np.where(auto, self.pulse < 0, coils[:, COIL_MANUAL_CLOSE]) & ~opening
+        self.pulse = np.sign(self.pulse) * np.maximum(np.abs(self.pulse) - dt, 0.0)
+
+        # Ход клапана за полное время хода из регистра
+        full_stroke = np.maximum(circuit(FULL_STROKE), 1.0)
+        self.valve = np.clip(self.valve + (opening.astype(float) - closing) * dt / full_stroke, 0.0, 1.0)
+
+        # Подача после смесителя: источник и обратка, инерция первого порядка
+        return_temp = self.room[:, None] + RETURN_FRACTION * (self.flow - self.room[:, None])
+        mixed = self.valve * SOURCE_TEMP + (1 - self.valve) * return_temp
+        self.flow += (mixed - self.flow) * (1 - np.exp(-dt / FLOW_TAU))
+
+        # Температура дома: теплоотдача контуров минус теплопотери
+        emitted = (np.asarray(UA_EMITTERS) * (self.flow - self.room[:, None])).sum(axis=1)
+        self.room += (emitted - self.heat_loss * (self.room - outdoor)) * dt / ROOM_CAPACITY
+
+        # Бойлер ГВС: гистерезис между ТЕМП ВКЛ и ТЕМП ВЫКЛ
+        on_temp = values[:, column(BOILER_ON_TEMP)]
+        off_temp = values[:, column(BOILER_OFF_TEMP)]
+        boiler_auto = coils[:, COIL_BOILER_AUTO]
+        self.relay = np.where(boiler_auto,
+                              (self.boiler < on_temp) | (self.relay & (self.boiler < off_temp)),
+                              coils[:, COIL_BOILER_RELAY])
+        self.boiler += self.relay * BOILER_HEAT_RATE * dt
+        self.boiler -= (self.boiler - BOILER_AMBIENT) * (1 - np.exp(-dt / BOILER_LOSS_TAU))
+
+        # Измерения и состояния реле, видимые по Modbus
+        values[:, column(OUTDOOR_TEMP)] = outdoor
+        values[:, [column(address) for address in REQUIRED_TEMP]] = required
+        values[:, [column(address) for address in CURRENT_TEMP]] = self.flow
+        values[:, [column(address) for address in SUPPLY_SENSOR]] = self.flow
+        values[:, column(HOME_SENSOR)] = self.room
+        values[:, column(BOILER_TEMP)] = self.boiler
+        coils[:, COIL_OPENING] = opening
+        coils[:, COIL_CLOSING] = closing
+        coils[:, COIL_BOILER_RELAY] = self.relay
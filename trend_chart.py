@@ -0,0 +1,98 @@
+import time
+import tkinter as tk
+
+import numpy as np
+
+# Отступы области графика на холсте: слева (подписи значений), справа, сверху, снизу (подписи времени)
+MARGINS = (45, 10, 10, 20)
+
+# Количество горизонтальных линий сетки
+GRID_LINES = 5
+
+
+def lttb(x, y, threshold):
+    """Индексы точек после прореживания Largest-Triangle-Three-Buckets.
+
+    Первая и последняя точки сохраняются, остальные делятся на threshold-2
+    корзины; из каждой выбирается точка, образующая наибольший треугольник
+    с выбранной точкой предыдущей корзины и средней точкой следующей.
+    Средние корзин считаются одной операцией, в цикле по корзинам - только
+    выбор максимума по срезу.
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.intp)
+    sizes = np.diff(edges)
+    averages_x = np.add.reduceat(x[1:count - 1], edges[:-1] - 1) / sizes
+    averages_y = np.add.reduceat(y[1:count - 1], edges[:-1] - 1) / sizes
+    # Для последней корзины следующая "средняя" точка - последняя точка ряда
+    next_x = np.append(averages_x[1:], x[-1])
+    next_y = np.append(averages_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - next_x[bucket]) * (y[low:high] - py) - (px - x[low:high]) * (next_y[bucket] - py))
+        previous = low + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+class TrendChart(tk.Canvas):
+    """График трендов на холсте Tk.
+
+    draw() рисует ряды (подпись, цвет, метки времени в мс, значения) за
+    интервал времени; каждый ряд прореживается LTTB до ширины области
+    графика в пикселях и выводится одной ломаной.
+    """
+
+    def __init__(self, parent, width=600, height=200, **options):
+        super().__init__(parent, width=width, height=height, bg="white", highlightthickness=0, **options)
+        self.width = width
+        self.height = height
+
+    def draw(self, series, start, end):
+        """Перерисовка графика рядов за интервал [start, end) мс."""
+        left, right, top, bottom = MARGINS
+        plot_width = self.width - left - right
+        plot_height = self.height - top - bottom
+        self.delete("all")
+
+        points = []
+        for label, color, timestamps, values in series:
+            valid = np.isfinite(values)
+            x = (timestamps[valid] - start) / 1000.0
+            y = values[valid].astype(np.float64)
+            if len(x):
+                keep = lttb(x, y, plot_width)
+                points.append((label, color, x[keep], y[keep]))
+
+        low = min((y.min() for _, _, _, y in points), default=0.0)
+        high = max((y.max() for _, _, _, y in points), default=1.0)
+        if high - low < 1.0:
+            low, high = (low + high) / 2 - 0.5, (low + high) / 2 + 0.5
+        span_x = max((end - start) / 1000.0, 1.0)
+
+        # Сетка и подписи значений
+        for i in range(GRID_LINES + 1):
+            value = low + (high - low) * i / GRID_LINES
+            pixel_y = top + plot_height * (1 - i / GRID_LINES)
+            self.create_line(left, pixel_y, left + plot_width, pixel_y, fill="#ddd")
+            self.create_text(left - 4, pixel_y, text=f"{value:.1f}", anchor="e", font=("Arial", 8))
+        for timestamp, anchor in ((start, "nw"), (end, "ne")):
+            pixel_x = left + plot_width * (timestamp - start) / 1000.0 / span_x
+            self.create_text(pixel_x, top + plot_height + 2, anchor=anchor, font=("Arial", 8),
+                             text=time.strftime("%d.%m %H:%M", time.localtime(timestamp / 1000)))
+
+        # Ряды и легенда
+        for index, (label, color, x, y) in enumerate(points):
+            pixel_x = left + plot_width * x / span_x
+            pixel_y = top + plot_height * (high - y) / (high - low)
+            if len(x) > 1:
+                self.create_line(*np.column_stack((pixel_x, pixel_y)).ravel().tolist(), fill=color, width=2)
+            self.create_text(left + 8 + 160 * index, top + 4, text=label, fill=color, anchor="nw",
+                             font=("Arial", 9, "bold"))
@@ -0,0 +1,19 @@
+class WidgetCache:
+    """Кэш последних отображённых параметров виджетов.
+
+    config() обращается к Tk только для параметров, значение которых
+    отличается от последнего отображённого.
+    """
+
+    def __init__(self):
+        self._rendered = {}
+
+    def config(self, widget, **options):
+        """Настройка виджета только изменившимися параметрами."""
+        rendered = self._rendered.setdefault(widget, {})
+        changed = {key: value for key, value in options.items() if rendered.get(key) != value}
+        if not changed:
+            return False
+        widget.config(**changed)
+        rendered.update(changed)
+        return True